@@ -0,0 +1,298 @@
+import numpy as np
+import pandas as pd
+
+from ingest import MONTH_INDEX, MONTHS_ORDER, payee_key
+
+
+# --- CUBO MENSAL ---
+# Dimensões do cubo; as flags dependem só do Tipo, então não multiplicam o número de células
+CUBE_DIMS = ['Ano', 'Mes_Pagamento', 'Tipo', 'Macro_Grupo', 'Banco', 'is_card_payment', 'is_investment']
+
+
+def build_cube(df):
+    """Agrega as transações em ano × mês × Tipo × Macro_Grupo × Banco com somas e contagens.
+
+    Entradas/Saidas guardam separadamente a soma dos valores positivos e negativos,
+    o que permite às abas montar gastos, receitas e impactos sem voltar às transações.
+    """
+    valor = df['Valor']
+    # As dimensões já chegam categóricas da ingestão (mês ordenado pelo calendário)
+    base = df[CUBE_DIMS].assign(
+        Valor=valor,
+        Entradas=valor.clip(lower=0),
+        Saidas=valor.clip(upper=0),
+        Qtd_Entradas=valor > 0,
+        Qtd_Saidas=valor < 0,
+    )
+    # dropna=False mantém as linhas sem mês válido, para os totais baterem com as transações
+    cube = base.groupby(CUBE_DIMS, observed=True, dropna=False).agg(
+        Valor=('Valor', 'sum'),
+        Entradas=('Entradas', 'sum'),
+        Saidas=('Saidas', 'sum'),
+        Qtd=('Valor', 'size'),
+        Qtd_Entradas=('Qtd_Entradas', 'sum'),
+        Qtd_Saidas=('Qtd_Saidas', 'sum'),
+    )
+    return cube.reset_index()
+
+
+def real_expenses(cube):
+    """Células de gasto real: nem investimento nem pagamento de fatura."""
+    return cube[~cube['is_card_payment'] & ~cube['is_investment'] & (cube['Qtd_Saidas'] > 0)]
+
+
+def monthly(cube, measure, by=()):
+    """Série mensal (ano, mês) de uma medida, opcionalmente quebrada por outras dimensões."""
+    keys = ['Ano', 'Mes_Pagamento', *by]
+    return cube.groupby(keys, observed=True)[measure].sum().reset_index().sort_values(keys)
+
+
+# --- COMPARAÇÃO ENTRE ANOS ---
+def year_over_year(cubes, measure, by=()):
+    """Série mensal de `measure` de cada ano lado a lado, com a variação sobre o mesmo mês do ano anterior.
+
+    `cubes` é {ano: cubo do ano}; a variação compara com o ano anterior presente em `cubes`.
+    """
+    partes = [monthly(cube, measure, by=by) for _, cube in sorted(cubes.items())]
+    serie = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=['Ano', 'Mes_Pagamento', *by, measure])
+    serie['Variacao'] = serie.groupby(['Mes_Pagamento', *by], observed=True)[measure].diff()
+    return serie
+
+
+def annual_totals(cubes):
+    """Entradas, custos reais, investimento e saldo de cada ano, com a variação dos custos sobre o ano anterior."""
+    linhas = []
+    for ano, cube in sorted(cubes.items()):
+        linhas.append({
+            "Ano": ano, "Entradas": float(cube['Entradas'].sum()),
+            "Custos": float(-real_expenses(cube)['Saidas'].sum()),
+            "Investido": float(-cube.loc[cube['is_investment'], 'Valor'].sum()),
+            "Saldo": float(cube['Valor'].sum()),
+        })
+    totais = pd.DataFrame(linhas, columns=['Ano', 'Entradas', 'Custos', 'Investido', 'Saldo'])
+    totais['Variacao_Custos'] = totais['Custos'].pct_change() * 100
+    return totais
+
+
+# --- PROJEÇÃO DE PARCELAS ---
+
+
+def period_label(periodo):
+    """'Março/2026' a partir do período inteiro."""
+    return f"{MONTHS_ORDER[periodo % 12]}/{periodo // 12}"
+
+
+def project_installments(df, start=None, horizon=None):
+    """Projeta as parcelas futuras de todas as compras parceladas.
+
+    Cada compra (qualquer parcela registrada dela) é expandida em todas as suas parcelas,
+    de 1 a Total a partir do mês da 1ª, e ficam as que caem de `start` em diante: as parcelas
+    futuras já lançadas no Notion contam uma vez só. `start` e o resultado usam períodos
+    inteiros (ver ingest.payment_period); `horizon` limita a projeção a N meses a partir de `start`.
+    """
+    hoje = pd.Timestamp.today()
+    start = hoje.year * 12 + hoje.month - 1 if start is None else start
+    colunas = ['Periodo', 'Mes', 'Transação', 'Banco', 'Parcela', 'Valor']
+
+    # O regex roda uma vez por categoria; sem nenhuma Parcela preenchida as categorias saem float
+    parcela = df['Parcela'].cat.rename_categories(df['Parcela'].cat.categories.astype(str))
+    partes = parcela.str.extract(r'^\s*(\d+)\s*/\s*(\d+)\s*$').astype('float64')
+    base = df.assign(Atual=partes[0], Total=partes[1], Valor=df['Valor'].abs())
+    base = base[(base['Atual'] >= 1) & (base['Atual'] <= base['Total']) & base['Periodo'].notna()]
+    if base.empty:
+        return pd.DataFrame(columns=colunas)
+    base = base.astype({'Atual': 'int64', 'Total': 'int64', 'Periodo': 'int64'})
+
+    # Cada mês de uma compra parcelada é uma linha no Notion; todas apontam para o mesmo
+    # mês da 1ª parcela, que junto com título/banco/valor identifica a compra.
+    base['Inicio'] = base['Periodo'] - base['Atual'] + 1
+    base = base.drop_duplicates(['Transação', 'Banco', 'Total', 'Valor', 'Inicio'])
+    # Compra já quitada antes de `start` não gera linha
+    base = base[base['Inicio'] + base['Total'] > start]
+
+    # Expansão vetorizada: uma linha por parcela de 1 até `Total`
+    n = base['Total'].to_numpy()
+    offset = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+    proj = base.iloc[np.repeat(np.arange(len(base)), n)][['Transação', 'Banco', 'Valor', 'Total', 'Inicio']]
+    proj['Periodo'] = proj['Inicio'].to_numpy() + offset
+    proj['Numero'] = offset + 1
+
+    fim = np.inf if horizon is None else start + horizon
+    proj = proj[(proj['Periodo'] >= start) & (proj['Periodo'] < fim)]
+    rotulos = {p: period_label(p) for p in proj['Periodo'].unique()}
+    proj = proj.assign(Parcela=proj['Numero'].astype(str) + "/" + proj['Total'].astype(str), Mes=proj['Periodo'].map(rotulos))
+    return proj[colunas].sort_values(['Periodo', 'Valor'], ascending=[True, False]).reset_index(drop=True)
+
+
+# --- INDICADORES (base das abas e do relatório em batch) ---
+def cash_flow(df_mes):
+    """Fluxo de caixa líquido do mês e taxa de poupança.
+
+    Investimento entra pelo saldo líquido: se aportou mais do que resgatou, o aporte
+    conta como investido; se resgatou mais, a sobra volta para as entradas do mês.
+    """
+    custos = df_mes.loc[df_mes['is_real_expense'], 'Valor'].abs().sum()
+    entradas = df_mes.loc[df_mes['is_real_income'], 'Valor'].sum()
+    saldo_investimentos = df_mes.loc[df_mes['is_investment'], 'Valor'].sum()
+    investido = max(-saldo_investimentos, 0.0)
+    entradas_totais = entradas + max(saldo_investimentos, 0.0)
+    sobra_livre = entradas_totais - custos - investido
+    poupado = sobra_livre + investido
+    return {
+        "entradas": float(entradas_totais),
+        "custos": float(custos),
+        "investido": float(investido),
+        "investimento_liquido": float(-saldo_investimentos),
+        "sobra_livre": float(sobra_livre),
+        "poupado": float(poupado),
+        "taxa_poupanca": float(poupado / entradas_totais * 100) if entradas_totais > 0 else 0.0,
+    }
+
+
+def expenses_by_bank(df_gastos):
+    """Total gasto por instituição (valores positivos)."""
+    return df_gastos.groupby('Banco', observed=True, dropna=False)['Valor'].sum().abs().reset_index()
+
+
+def investment_goal(cube_mes, meta):
+    """Aporte líquido do mês contra a meta de investimentos."""
+    saldo = cube_mes.loc[cube_mes['is_investment'], 'Valor'].sum()
+    realizado = float(max(-saldo, 0.0))
+    return {
+        "meta": meta,
+        "realizado": realizado,
+        "diferenca": realizado - meta,
+        "atingimento": realizado / meta * 100 if meta > 0 else 0.0,
+    }
+
+
+def budget(cube_mes, metas):
+    """Gasto real de cada grupo contra o teto em `metas` ({Macro_Grupo: teto}).
+
+    Gasto_Na_Meta + Folga + Estouro formam a barra empilhada da aba Metas.
+    """
+    gastos = real_expenses(cube_mes).groupby('Macro_Grupo', observed=True)['Saidas'].sum().abs()
+    linhas = []
+    for grupo, teto in metas.items():
+        gasto = float(gastos.get(grupo, 0.0))
+        linhas.append({
+            "Categoria": grupo, "Meta": teto, "Gasto": gasto,
+            "Gasto_Na_Meta": min(gasto, teto), "Folga": max(teto - gasto, 0.0), "Estouro": max(gasto - teto, 0.0),
+        })
+    return pd.DataFrame(linhas, columns=['Categoria', 'Meta', 'Gasto', 'Gasto_Na_Meta', 'Folga', 'Estouro'])
+
+
+def payee_ranking(df_gastos, exclude=(), n=10, aliases=None):
+    """Os `n` favorecidos que mais receberam, sem pagamentos de fatura nem os nomes em `exclude`."""
+    return PayeeIndex(df_gastos, exclude, aliases).top(n=n)
+
+
+# --- FAVORECIDOS ---
+# Trechos de chave (ver ingest.payee_key) que tiram o favorecido do ranking: faturas de cartão
+PAYEE_EXCLUDED = ("cartao",)
+
+
+class PayeeIndex:
+    """Total gasto por favorecido em cada período, sobre a chave normalizada da ingestão.
+
+    `aliases` ({nome exibido: [grafias]}) junta grafias diferentes do mesmo favorecido. A
+    exclusão (faturas de cartão e os nomes em `exclude`) é decidida uma vez por favorecido.
+    O ranking de um ano/mês é um top-k sobre os totais, guardado após a primeira consulta.
+    """
+
+    def __init__(self, df, exclude=(), aliases=None):
+        aliases = aliases or {}
+        # Grafia (chave) -> chave canônica
+        canonicas = {payee_key(g): payee_key(nome) for nome, grafias in aliases.items() for g in [nome, *grafias]}
+        chave = df['Favorecido_Chave']
+        codigos, favorecidos = pd.factorize(
+            np.array([canonicas.get(c, c) for c in chave.cat.categories], dtype=object), sort=True)
+        excluir = [k for k in (*PAYEE_EXCLUDED, *map(payee_key, exclude)) if k]
+        self.excluded = np.array([any(e in f for e in excluir) for f in favorecidos], dtype=bool)
+        self.labels = self._labels(df['Favorecido'], favorecidos, canonicas,
+                                   {payee_key(nome): nome for nome in aliases})
+
+        favorecido = np.append(codigos, -1)[chave.cat.codes.to_numpy()]
+        linhas = df['is_real_expense'].to_numpy() & (favorecido >= 0) & ~np.append(self.excluded, True)[favorecido]
+        totais = pd.DataFrame({
+            'Ano': df['Ano'].to_numpy()[linhas],
+            'Periodo': df['Periodo'].fillna(-1).to_numpy(dtype='int64')[linhas],
+            'Favorecido': favorecido[linhas],
+            'Valor_Abs': np.abs(df['Valor'].to_numpy()[linhas]),
+        })
+        self.totals = totais.groupby(['Ano', 'Periodo', 'Favorecido'])['Valor_Abs'].sum()
+        self._top = {}
+
+    @staticmethod
+    def _labels(favorecido, chaves, canonicas, nomes):
+        """Nome exibido de cada chave: o do alias ou a grafia mais frequente.
+
+        No empate vence a grafia mais bem escrita: sem espaços sobrando, com acentos e com
+        inicial maiúscula ('Padaria São João' antes de ' padaria sao  joao').
+        """
+        contagem = np.bincount(favorecido.cat.codes.to_numpy() + 1, minlength=len(favorecido.cat.categories) + 1)[1:]
+        melhor = {}
+        for grafia, n in zip(favorecido.cat.categories, contagem.tolist()):
+            chave = payee_key(grafia)
+            limpa = " ".join(grafia.split())
+            nota = (n, limpa == grafia, chave != limpa.casefold(), grafia[:1].isupper())
+            chave = canonicas.get(chave, chave)
+            if chave not in melhor or nota > melhor[chave][0]:
+                melhor[chave] = (nota, grafia)
+        return np.array([nomes.get(c) or melhor.get(c, (None, c))[1] for c in chaves], dtype=object)
+
+    def top(self, ano=None, mes=None, n=10):
+        """Os `n` favorecidos que mais receberam (em `ano`/`mes`, se dados): Favorecido, Valor_Abs."""
+        chave = (ano, mes, n)
+        if chave not in self._top:
+            totais = self.totals
+            if ano is not None:
+                totais = totais[totais.index.get_level_values('Ano') == ano]
+            if mes is not None:
+                totais = totais[totais.index.get_level_values('Periodo') == ano * 12 + MONTH_INDEX[mes]]
+            soma = totais.groupby(level='Favorecido').sum().nlargest(n)
+            self._top[chave] = pd.DataFrame({'Favorecido': self.labels[soma.index.to_numpy()], 'Valor_Abs': soma.to_numpy()})
+        return self._top[chave]
+
+
+# --- GRÁFICOS HIERÁRQUICOS (sunburst/treemap) ---
+OUTROS = "Outros"
+# Rótulo dos valores nulos nos gráficos (o gráfico não aceita nó sem nome)
+SEM_INFO = "Não informado"
+
+
+def top_n_rollup(df, path, value, n=10, other=OUTROS, missing=SEM_INFO):
+    """Pré-agrega `value` pela hierarquia `path`, com no máximo `n` filhos por nó.
+
+    Em cada nível os `n` maiores filhos de cada pai ficam e o resto vira um único nó
+    `other` com a soma deles (sem descendentes). O resultado tem uma linha por folha,
+    então o tamanho do gráfico não cresce com o histórico. Nulos viram o nó `missing`.
+    """
+    agg = df.groupby(path, observed=True, dropna=False)[value].sum().reset_index()
+    # Já agregado: texto puro, para aceitar os rótulos fora das categorias
+    agg[path] = agg[path].astype(object).fillna(missing)
+    for i, coluna in enumerate(path):
+        nivel = path[:i + 1]
+        # Nós já dobrados em um nível acima têm None daqui para baixo
+        nos = agg[agg[coluna].notna()].groupby(nivel, observed=True)[value].sum()
+        rank = nos.groupby(level=path[:i]).rank(method='first', ascending=False) if i else nos.rank(method='first', ascending=False)
+        fora = rank.index[rank > n]
+        if fora.empty:
+            continue
+        dobrar = agg.set_index(nivel).index.isin(fora)
+        agg.loc[dobrar, coluna] = other
+        agg.loc[dobrar, path[i + 1:]] = None
+        agg = agg.groupby(path, observed=True, dropna=False)[value].sum().reset_index()
+    return agg
+
+
+def rollup_detail(df, path, value, parent, n=10, missing=SEM_INFO):
+    """Drill-down de "Outros": os itens do último nível de `path` que top_n_rollup dobrou sob `parent`.
+
+    `parent` traz os valores dos níveis acima (path[:-1]), com `missing` no lugar dos nulos.
+    """
+    filtros = [df[coluna].isna() if valor == missing else df[coluna] == valor for coluna, valor in zip(path, parent)]
+    filtro = np.logical_and.reduce(filtros) if parent else np.ones(len(df), bool)
+    itens = df[filtro].groupby(path[-1], observed=True, dropna=False)[value].sum().sort_values(ascending=False)
+    itens.index = itens.index.astype(object).fillna(missing)
+    return itens.iloc[n:].reset_index()
@@ -1,35 +1,24 @@
 import datetime
+import functools
 import pandas as pd
-import plotly.express as px
-import requests
+import plotly.express
 import streamlit as st
 
+from analytics import (OUTROS, PayeeIndex, annual_totals, budget, build_cube, cash_flow, expenses_by_bank, investment_goal,
+                       monthly, project_installments, real_expenses, rollup_detail, top_n_rollup, year_over_year)
+from dataset import BackgroundRefresher
+from formatting import formata_br, formata_br_array
+from ingest import MONTHS_ORDER, PeriodIndex, memory_report, process_rows
+from ledger import Ledger
+from notion_api import NotionClient
+from notion_store import NotionStore
+from profiling import PROFILER, Instrumented
+from settings import Settings, flag
+from snapshot import load_snapshot, save_snapshot
+from tables import paginate
 
-# --- CONSTANTES ---
-MONTHS_ORDER = [
-    'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 
-    'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'
-]
-
-MACRO_CATEGORY_MAP = {
-    "Remuneração": "Rendas", "Cashback": "Rendas", "Rendimento": "Rendas", "Adicional": "Rendas",
-    "Moradia": "Despesas essenciais", "Contas residenciais": "Despesas essenciais",
-    "Supermercado": "Despesas essenciais", "Transporte": "Despesas essenciais",
-    "TV / Internet / Telefone": "Despesas essenciais", "Pets": "Despesas essenciais",
-    "Filhos": "Despesas essenciais", "Medicamentos": "Despesas essenciais",
-    "Plano de saúde": "Despesas essenciais", "Nutrição e atividade física": "Despesas essenciais",
-    "Cuidados médicos ou psicológicos": "Despesas essenciais", "Trabalho": "Despesas essenciais",
-    "Educação": "Despesas essenciais", "Previdência": "Despesas essenciais",
-    "Reforma": "Gastos não essenciais", "Bares / Restaurantes / Delivery": "Gastos não essenciais",
-    "Móveis e eletrodomésticos": "Gastos não essenciais", "Decoração e jardinagem": "Gastos não essenciais",
-    "Eletrônicos": "Gastos não essenciais", "Vestuário": "Gastos não essenciais",
-    "Estética": "Gastos não essenciais", "Lazer": "Gastos não essenciais",
-    "Presentes": "Gastos não essenciais", "Doações": "Gastos não essenciais",
-    "Viagens": "Gastos não essenciais", "Imóveis": "Investimentos", "Renda fixa": "Investimentos",
-    "Imposto de renda": "Impostos e taxas", "Impostos municipais": "Impostos e taxas",
-    "Taxas bancárias": "Impostos e taxas"
-}
 
+# --- CONSTANTES ---
 MAPA_CORES_MACRO = {
     "Despesas essenciais": "#F4A261",    # Laranja Areia Vivo (era o terracota apagado)
     "Gastos não essenciais": "#EF476F",  # Rosa/Melancia Vibrante (era o rosa sóbrio)
@@ -46,20 +35,30 @@ MAPA_CORES_RENDAS = {
     "Plano de saúde": "#06D6A0",    
 }
 
-SALDO_INICIAL_RENDA_FIXA = float(st.secrets.get("SALDO_INICIAL_RENDA_FIXA", 0.00))
-DIVIDA_ATUAL_CASA = float(st.secrets.get("DIVIDA_ATUAL_CASA", 0.00))
-DIVIDA_ATUAL_TERRENO = float(st.secrets.get("DIVIDA_ATUAL_TERRENO", 0.00))
+# Máximo de fatias por nível nos sunbursts/treemaps; o resto vira "Outros"
+TOP_N_GRAFICOS = int(st.secrets.get("TOP_N_GRAFICOS", 12))
 
-METAS_CUSTOS = {
-    "Despesas essenciais": float(st.secrets.get("META_ESSENCIAIS", 0.00)),
-    "Gastos não essenciais": float(st.secrets.get("META_NAO_ESSENCIAIS", 0.00)),
-    "Impostos e taxas": float(st.secrets.get("META_IMPOSTOS", 0.00))
-}
+# Linhas por página nas tabelas; acima disso a tabela ganha busca, ordenação e paginação
+TABELA_LINHAS = 50
+
+# Saldos, dívidas e metas vêm dos secrets (ver settings.Settings)
+SETTINGS = Settings.from_secrets(st.secrets)
+METAS_CUSTOS = SETTINGS.metas_custos
+META_INVESTIMENTOS = SETTINGS.meta_investimentos
 
-META_INVESTIMENTOS = float(st.secrets.get("META_INVESTIMENTOS", 0.00))
+# Snapshot em disco do dataset processado: partida a frio instantânea e modo offline.
+# Sem token do Notion (ou com MODO_OFFLINE) o app só lê o snapshot.
+SNAPSHOT_PATH = st.secrets.get("SNAPSHOT_PATH", ".cache/snapshot.arrow")
+MODO_OFFLINE = flag(st.secrets.get("MODO_OFFLINE", False)) or "NOTION_TOKEN" not in st.secrets
 
 st.set_page_config(page_title="💲 Dashboard Financeiro", layout="wide")
 
+# --- INSTRUMENTAÇÃO (painel de debug; desligada por padrão) ---
+# Construção das figuras (px.*) e serialização de gráficos/tabelas viram spans próprios
+px = Instrumented(plotly.express, "px", PROFILER)
+plotly_chart = PROFILER.timed("st.plotly_chart")(st.plotly_chart)
+dataframe = PROFILER.timed("st.dataframe")(st.dataframe)
+
 
 # --- AUTENTICAÇÃO ---
 def check_password():
@@ -76,65 +75,120 @@ def check_password():
 
 
 # --- DADOS ---
-class NotionClient:
-    def __init__(self):
-        self.token = st.secrets["NOTION_TOKEN"]
-        self.db_id = st.secrets["DATABASE_ID"]
-        self.headers = {"Authorization": f"Bearer {self.token}", "Notion-Version": "2022-06-28", "Content-Type": "application/json"}
-
-    @st.cache_data(ttl=600)
-    def fetch_all_pages(_self):
-        url = f"https://api.notion.com/v1/databases/{_self.db_id}/query"
-        all_pages, has_more, next_cursor = [], True, None
-        while has_more:
-            payload = {"start_cursor": next_cursor} if next_cursor else {}
-            response = requests.post(url, json=payload, headers=_self.headers)
-            if response.status_code != 200: raise Exception(f"Erro Notion: {response.text}")
-            data = response.json()
-            all_pages.extend(data.get("results", []))
-            has_more, next_cursor = data.get("has_more", False), data.get("next_cursor")
-        return all_pages
-
-def get_prop_safe(prop, p_type):
-    if not prop: return "N/A"
-    try:
-        if p_type == "select": return prop["select"]["name"] if prop["select"] else "N/A"
-        if p_type == "people": return prop["people"][0]["name"] if prop["people"] else "N/A"
-        if p_type == "rich_text": return prop["rich_text"][0]["plain_text"] if prop["rich_text"] else "N/A"
-        if p_type == "formula": return prop["formula"].get("string", "N/A")
-        if p_type == "title": return prop["title"][0]["plain_text"] if prop["title"] else "Sem Título"
-        if p_type == "number": return prop.get("number", 0) or 0
-    except: return "N/A"
-    return "N/A"
-
-def process_data(results):
-    rows = []
-    for page in results:
-        p = page["properties"]
-        rows.append({
-            "Data": get_prop_safe(p.get("Data"), "formula"),
-            "Banco": get_prop_safe(p.get("Banco"), "select"),
-            "Transação": get_prop_safe(p.get("Transação"), "title"),
-            "Valor": get_prop_safe(p.get("Valor"), "number") * -1,
-            "Tipo": get_prop_safe(p.get("Tipo de despesa"), "select"),
-            "Mes_Pagamento": get_prop_safe(p.get("Mês de pagamento"), "select"),
-            "Favorecido": get_prop_safe(p.get("Favorecido"), "rich_text"),
-            "Descrição": get_prop_safe(p.get("Descrição"), "rich_text"),
-            "Parcela": get_prop_safe(p.get("Parcela"), "rich_text")
-        })
-    df = pd.DataFrame(rows)
-    if not df.empty:
-        df['Data'] = pd.to_datetime(df['Data'], dayfirst=True, errors='coerce')
-        df['Macro_Grupo'] = df['Tipo'].map(lambda x: MACRO_CATEGORY_MAP.get(x, 'Outros'))
-    return df
-
-def formata_br(valor):
-    """Converte float americano para string no padrão PT-BR."""
-    return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+@st.cache_resource
+def get_client():
+    store_path = st.secrets.get("NOTION_STORE_PATH", ".cache/notion.sqlite3")
+    store = NotionStore(store_path, st.secrets["DATABASE_ID"]) if store_path else None
+    return NotionClient(st.secrets["NOTION_TOKEN"], st.secrets["DATABASE_ID"], store=store)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def data_version():
+    # Sonda de uma requisição: enquanto ela não muda, os dados em cache continuam valendo
+    PROFILER.count("cache.data_version.misses")
+    with PROFILER.span("notion.probe"):
+        return get_client().probe()
+
+@st.cache_resource
+def get_dataset():
+    # Com store local só as páginas editadas desde a última sincronização trafegam.
+    # O refresher guarda o DataFrame tipado e revalida em background, sem travar a tela.
+    # O snapshot do disco é servido desde a primeira visita enquanto o Notion é reconciliado.
+    db_id = st.secrets.get("DATABASE_ID", "")
+    inicial = load_snapshot(SNAPSHOT_PATH, db_id) if SNAPSHOT_PATH else None
+    if MODO_OFFLINE:
+        return BackgroundRefresher(probe=None, load=None, initial=inicial)
+    client = get_client()
+
+    def carrega(atual):
+        # Conteúdo igual ao do snapshot atual: nada de reprocessar, regravar nem invalidar caches
+        with PROFILER.span("notion.sync"):
+            rows, version = client.sync(known_version=atual)
+        if rows is None:
+            return version, None
+        with PROFILER.span("process_rows"):
+            return version, process_rows(rows)
+
+    salvar = (lambda snap: save_snapshot(SNAPSHOT_PATH, snap, db_id)) if SNAPSHOT_PATH else None
+    return BackgroundRefresher(probe=client.probe, load=carrega, max_idle=client.reconcile_interval, initial=inicial,
+                               on_refresh=salvar)
+
+@st.cache_data(max_entries=48)
+def fetch_month(mes, ano, version):
+    # A Data pode cair no ano anterior/seguinte ao do pagamento (ex.: compra de dezembro paga em janeiro),
+    # então o Notion devolve os três anos vizinhos e o corte exato é feito aqui.
+    PROFILER.count("cache.fetch_month.misses")
+    with PROFILER.span("notion.fetch_partition"):
+        rows = get_client().fetch_partition(mes, anos=(ano - 1, ano, ano + 1))
+    with PROFILER.span("process_rows"):
+        df = process_rows(rows)
+        return PeriodIndex(df).month(df, mes, ano)
+
+@st.cache_resource(max_entries=8)
+def get_year(version, ano, _snapshot):
+    # Partição de um ano (fatia sem cópia, pelo índice de períodos) e seu cubo, sob demanda:
+    # abrir o ano corrente não agrega os anteriores, e trocar de aba só lê fatias do cubo
+    PROFILER.count("cache.get_year.misses")
+    df_ano = _snapshot.index.year(_snapshot.df, ano)
+    with PROFILER.span("build_cube"):
+        return df_ano, build_cube(df_ano)
+
+@st.cache_resource(max_entries=8)
+def get_payees(version, ano, meu_nome, aliases, _snapshot):
+    # Totais por favorecido e período de um ano (como get_year, abrir o ano corrente não lê os anteriores).
+    # Nome e aliases entram na chave (aliases como tupla ordenada): editar os secrets refaz o índice
+    PROFILER.count("cache.get_payees.misses")
+    with PROFILER.span("payee_index"):
+        return PayeeIndex(_snapshot.index.year(_snapshot.df, ano), exclude=[meu_nome], aliases=dict(aliases))
+
+@st.cache_resource
+def get_ledger():
+    # Saldos correntes das contas de ativo e passivo, atualizados de forma incremental a cada versão
+    return Ledger()
+
+def cached(nome, fn, *args):
+    # Conta as chamadas às funções em cache; os misses são contados dentro delas
+    PROFILER.count(f"cache.{nome}.calls")
+    return fn(*args)
+
+def fragment(fn):
+    # st.fragment que liga o profiler também quando só o fragmento reexecuta (fora do script_run)
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with PROFILER.recording(profiling_on()):
+            return fn(*args, **kwargs)
+    return st.fragment(wrapper)
 
 # --- COMPONENTES VISUAIS ---
+def render_table(df, key, sort_by=None, ascending=True, search_columns=('Transação',)):
+    """Tabela tipada e paginada no servidor; o formato pt-BR (vetorizado) é aplicado só às linhas exibidas.
+
+    Valor/Data continuam numéricos/datas (ordenação correta no navegador) e só a página
+    atual trafega a cada rerun.
+    """
+    pagina, total, paginas = df, len(df), 1
+    if len(df) > TABELA_LINHAS:
+        c1, c2, c3, c4 = st.columns([3, 2, 1, 1])
+        busca = c1.text_input("Buscar:", key=f"{key}_busca", placeholder=", ".join(search_columns))
+        colunas = list(df.columns)
+        ordem = c2.selectbox("Ordenar por:", colunas, index=colunas.index(sort_by) if sort_by in colunas else 0, key=f"{key}_ordem")
+        decrescente = c3.toggle("Decrescente", value=not ascending, key=f"{key}_desc")
+        num_pagina = c4.number_input("Página:", min_value=1, value=1, step=1, key=f"{key}_pagina")
+        pagina, total, paginas = paginate(df, num_pagina, TABELA_LINHAS, sort_by=ordem, ascending=not decrescente,
+                                          search=busca, search_columns=[c for c in search_columns if c in colunas])
+        st.caption(f"Página {min(num_pagina, paginas)} de {paginas} · {total} linhas")
+    elif sort_by is not None:
+        pagina = df.sort_values(sort_by, ascending=ascending, kind='stable')
+
+    formatos = {'Data': '{:%d/%m/%Y}'} if 'Data' in pagina.columns else {}
+    if 'Valor' in pagina.columns:
+        # A página inteira é formatada de uma vez; o Styler só consulta o texto pronto de cada célula
+        rotulos = dict(zip(pagina['Valor'], formata_br_array(pagina['Valor'])))
+        formatos['Valor'] = rotulos.__getitem__
+    dataframe(pagina.style.format(formatos, na_rep="—"), hide_index=True, use_container_width=True)
+
+@PROFILER.timed()
 def render_bank_treemap(df_gastos_filtrado):
-    df_banco = df_gastos_filtrado.groupby('Banco')['Valor'].sum().abs().reset_index()
+    df_banco = top_n_rollup(expenses_by_bank(df_gastos_filtrado), ['Banco'], 'Valor', n=TOP_N_GRAFICOS)
     
     fig = px.treemap(df_banco, path=['Banco'], values='Valor', title="Custos por Instituição", color='Valor', height=275, color_continuous_scale='Reds')
     fig.update_traces(textinfo="label+text", texttemplate="<b>%{label}</b><br>R$ %{value:,.2f}", textfont_size=14)
@@ -143,50 +197,22 @@ def render_bank_treemap(df_gastos_filtrado):
     fig.update_layout(separators=",.")
     return fig
 
+@PROFILER.timed()
 def render_saude(df_mes):
     c1, c2 = st.columns(2)
     
-    # Calculamos os gastos reais apenas UMA vez para todo o painel
-    filtro_saidas = (
-        (df_mes['Valor'] < 0) & 
-        (df_mes['Macro_Grupo'] != "Investimentos") & 
-        (~df_mes['Tipo'].astype(str).str.contains("Pagamento de cartão", case=False, na=False))
-    )
-    df_gastos_reais = df_mes[filtro_saidas].copy()
+    # Gastos reais: saídas que não são investimento nem pagamento de fatura (flag da ingestão)
+    df_gastos_reais = df_mes[df_mes['is_real_expense']]
     
-    # O total matemático exato que deve bater em todos os lugares
-    total_gastos = df_gastos_reais['Valor'].abs().sum()
+    # Entradas, custos, investimento líquido e taxa de poupança (analytics.cash_flow)
+    fluxo = cash_flow(df_mes)
+    total_gastos = fluxo['custos']
+    taxa = fluxo['taxa_poupanca']
 
     with c1:
-        # 1. Entradas reais (agora EXCLUÍMOS os investimentos para não somar resgate como se fosse salário)
-        entradas_comuns = df_mes[
-            (df_mes['Valor'] > 0) & 
-            (df_mes['Macro_Grupo'] != "Investimentos") & 
-            (~df_mes['Tipo'].astype(str).str.contains("Pagamento de cartão", case=False, na=False))
-        ]['Valor'].sum()
-        
-        # 2. O Saldo Líquido de Investimentos (Aportes negativos + Resgates positivos)
-        saldo_investimentos = df_mes[df_mes['Macro_Grupo'] == "Investimentos"]['Valor'].sum()
-        
-        if saldo_investimentos < 0:
-            # Aportou mais do que resgatou (dinheiro efetivamente virou patrimônio)
-            total_investido = abs(saldo_investimentos)
-            entradas_totais = entradas_comuns
-        else:
-            # Resgatou mais do que aportou (o saldo extra volta para compor o caixa do mês)
-            total_investido = 0
-            entradas_totais = entradas_comuns + saldo_investimentos
-            
-        # 3. Sobra Livre na Conta
-        sobra_livre = entradas_totais - total_gastos - total_investido
-        
-        # 4. Taxa de Poupança real (Tudo que não virou fumaça / Total que entrou)
-        valor_poupado = sobra_livre + total_investido
-        taxa = (valor_poupado / entradas_totais * 100) if entradas_totais > 0 else 0
-        
-        # 5. Configuração do Gráfico com a paleta de tons sóbrios
+        # Configuração do Gráfico com a paleta de tons sóbrios
         categorias_pizza = ['Sobra na Conta', 'Investimentos', 'Custos']
-        valores_pizza = [max(0, sobra_livre), total_investido, total_gastos]
+        valores_pizza = [max(0, fluxo['sobra_livre']), fluxo['investido'], total_gastos]
         
         mapa_de_cores = {
             'Sobra na Conta': '#06D6A0',  # O Verde vivo
@@ -222,44 +248,39 @@ def render_saude(df_mes):
         )
         fig.update_traces(textfont_size=16)
         
-        st.plotly_chart(fig, use_container_width=True, key="pie_saude")
-        st.plotly_chart(render_bank_treemap(df_gastos_reais), use_container_width=True, key="tree_banco")
+        plotly_chart(fig, use_container_width=True, key="pie_saude")
+        plotly_chart(render_bank_treemap(df_gastos_reais), use_container_width=True, key="tree_banco")
 
     with c2:
         # === INVESTIMENTOS (Corrigido) ===
-        # Adicione o .copy() para evitar avisos do Pandas ao modificar a coluna
-        df_inv = df_mes[df_mes['Macro_Grupo'] == "Investimentos"].copy() 
+        df_inv = df_mes[df_mes['is_investment']]
         
-        saldo_inv = df_inv['Valor'].sum()
-        saldo_inv = saldo_inv * -1
-        st.subheader(f"Investimentos: R$ {formata_br(saldo_inv)}")
+        st.subheader(f"Investimentos: R$ {formata_br(fluxo['investimento_liquido'])}")
         
         if not df_inv.empty:
-            # Formata a data igual à tabela de gastos
-            df_inv['Data'] = df_inv['Data'].dt.strftime('%d/%m/%Y')
-            df_inv['Valor'] = df_inv['Valor'].apply(formata_br)
-            st.dataframe(df_inv[['Data', 'Transação', 'Valor', 'Tipo']].sort_values('Data'), hide_index=True)
+            # Mesmo formato da tabela de gastos, aplicado só na exibição
+            render_table(df_inv[['Data', 'Transação', 'Valor', 'Tipo']], "tab_inv", sort_by='Data')
         
         # === CUSTOS ===
         st.subheader(f"Custos: R$ {formata_br(total_gastos)}")
-        df_audit = df_gastos_reais[['Data', 'Transação', 'Valor', 'Tipo']].sort_values('Data')
-        df_audit['Data'] = df_audit['Data'].dt.strftime('%d/%m/%Y')
-        df_audit['Valor'] = df_audit['Valor'].apply(formata_br)
-        st.dataframe(df_audit, use_container_width=True, hide_index=True)
-
-def render_historico(df):
-    df_anual = df.groupby('Mes_Pagamento', observed=True)['Valor'].sum().reset_index()
-    df_anual['Mes_Pagamento'] = pd.Categorical(df_anual['Mes_Pagamento'], categories=MONTHS_ORDER, ordered=True)
-    fig = px.bar(df_anual.sort_values('Mes_Pagamento'), x='Mes_Pagamento', y='Valor', title='Saldos mensais', color='Valor', color_continuous_scale='RdYlGn')
+        render_table(df_gastos_reais[['Data', 'Transação', 'Valor', 'Tipo']], "tab_custos", sort_by='Data',
+                     search_columns=('Transação', 'Tipo'))
+
+@PROFILER.timed()
+def render_historico(df, cube, ano):
+    df_anual = monthly(cube, 'Valor')
+    fig = px.bar(df_anual, x='Mes_Pagamento', y='Valor', title=f'Saldos mensais em {ano}', color='Valor', color_continuous_scale='RdYlGn')
     fig.update_traces(hovertemplate="Mês: %{x}<br>Saldo: R$ %{y:,.2f}<extra></extra>")
     fig.update_layout(title_font=dict(size=24, family="sans-serif"), title_x=0)
     fig.update_layout(separators=",.")
-    st.plotly_chart(fig, use_container_width=True, key="hist_anual")
+    plotly_chart(fig, use_container_width=True, key="hist_anual")
     
     c1, c2 = st.columns(2)
     with c1:
-        df_ent = df[(df['Valor'] > 0) & (df['Tipo'] != "Pagamento de cartão")]
+        df_ent = df[(df['Valor'] > 0) & ~df['is_card_payment']]
         if not df_ent.empty:
+            # Pré-agregado com no máximo TOP_N_GRAFICOS descrições por Tipo
+            df_ent = top_n_rollup(df_ent, ['Tipo', 'Descrição'], 'Valor', n=TOP_N_GRAFICOS)
             # Adicionada a coluna 'Transação' ao path
             fig_ent = px.sunburst(
                 df_ent, 
@@ -267,19 +288,20 @@ def render_historico(df):
                 values='Valor', 
                 color='Tipo',                        # O Plotly vai olhar para o Tipo para pintar
                 color_discrete_map=MAPA_CORES_RENDAS,# Passamos a nossa paleta de rendas
-                title="Rendimentos neste ano",
+                title=f"Rendimentos em {ano}",
                 height=800
             )
             # Formatação de 2 casas decimais para o Sunburst
             fig_ent.update_traces(hovertemplate="<b>%{label}</b><br>Valor: R$ %{value:,.2f}<extra></extra>")
             fig_ent.update_layout(title_font=dict(size=24, family="sans-serif"), title_x=0)
             fig_ent.update_layout(separators=",.")
-            st.plotly_chart(fig_ent, use_container_width=True, key="sun_ent")
+            plotly_chart(fig_ent, use_container_width=True, key="sun_ent")
     
     with c2:
-        df_sai = df[(df['Valor'] < 0) & (df['Tipo'] != "Pagamento de cartão")].copy()
+        df_sai = df[(df['Valor'] < 0) & ~df['is_card_payment']].copy()
         df_sai['Valor_Abs'] = df_sai['Valor'].abs()
         if not df_sai.empty:
+            df_sai = top_n_rollup(df_sai, ['Macro_Grupo', 'Tipo'], 'Valor_Abs', n=TOP_N_GRAFICOS)
             # --- MUDANÇA AQUI: O path agora define o centro como Macro_Grupo e a borda como Tipo ---
             fig_sai = px.sunburst(
                 df_sai, 
@@ -287,27 +309,112 @@ def render_historico(df):
                 values='Valor_Abs', 
                 color='Macro_Grupo',                  # Dizemos que a cor baseia-se no Macro_Grupo
                 color_discrete_map=MAPA_CORES_MACRO,  # Passamos a nossa paleta
-                title="<b>Custos neste ano</b>",
+                title=f"<b>Custos em {ano}</b>",
                 height=800
             )
             # Formatação de 2 casas decimais para o Sunburst
             fig_sai.update_traces(hovertemplate="<b>%{label}</b><br>Valor: R$ %{value:,.2f}<extra></extra>")
             fig_sai.update_layout(title_font=dict(size=24, family="sans-serif"), title_x=0)
             fig_sai.update_layout(separators=",.")
-            st.plotly_chart(fig_sai, use_container_width=True, key="sun_sai")
+            plotly_chart(fig_sai, use_container_width=True, key="sun_sai")
+
+@PROFILER.timed()
+def render_comparativo(anos, ano, cube_of):
+    # Comparação entre anos: só os anos escolhidos são agregados (cube_of -> get_year)
+    st.subheader("📅 Comparação entre anos")
+    escolhidos = st.multiselect("Anos:", anos, default=[a for a in (ano - 1, ano) if a in anos], key="sel_anos_yoy")
+    if len(escolhidos) < 2:
+        st.info("Escolha ao menos dois anos para comparar.")
+        return
+    cubes = {a: cube_of(a) for a in escolhidos}
 
-def render_raiox(df):
-    df_gastos = df[(df['Valor'] < 0) & (~df['Tipo'].str.contains("Investiment", case=False)) & (~df['Tipo'].astype(str).str.contains("Pagamento de cartão", case=False, na=False))].copy()
-    df_gastos['Valor_Abs'] = df_gastos['Valor'].abs()
-    
+    totais = annual_totals(cubes)
+    # Como em render_table: cada coluna é formatada de uma vez e o Styler só consulta o texto pronto
+    formatos = {c: dict(zip(totais[c], formata_br_array(totais[c]))).__getitem__ for c in ['Entradas', 'Custos', 'Investido', 'Saldo']}
+    dataframe(totais.style.format({**formatos, 'Variacao_Custos': '{:+.1f}%'}, na_rep="—"), hide_index=True, use_container_width=True)
+
+    c1, c2 = st.columns(2)
+    with c1:
+        df_saldos = year_over_year(cubes, 'Valor')
+        fig = px.bar(df_saldos, x='Mes_Pagamento', y='Valor', color=df_saldos['Ano'].astype(str), barmode='group',
+                     title="<b>Saldos mensais por ano</b>", custom_data=['Variacao'])
+        fig.update_traces(hovertemplate="Mês: %{x}<br>Saldo: R$ %{y:,.2f}<br>Vs. ano anterior: R$ %{customdata[0]:,.2f}<extra></extra>")
+        fig.update_layout(title_font=dict(size=24, family="sans-serif"), title_x=0)
+        fig.update_layout(separators=",.", xaxis_title=None, yaxis_title=None, legend_title_text=None)
+        plotly_chart(fig, use_container_width=True, key="bar_yoy_saldos")
+    with c2:
+        df_custos = year_over_year({a: real_expenses(c) for a, c in cubes.items()}, 'Saidas', by=['Macro_Grupo'])
+        df_custos = df_custos.groupby(['Ano', 'Macro_Grupo'], observed=True)['Saidas'].sum().abs().reset_index()
+        fig = px.bar(df_custos, x='Macro_Grupo', y='Saidas', color=df_custos['Ano'].astype(str), barmode='group',
+                     title="<b>Custos por grupo e ano</b>")
+        fig.update_traces(hovertemplate="Grupo: %{x}<br>Custos: R$ %{y:,.2f}<extra></extra>")
+        fig.update_layout(title_font=dict(size=24, family="sans-serif"), title_x=0)
+        fig.update_layout(separators=",.", xaxis_title=None, yaxis_title=None, legend_title_text=None)
+        plotly_chart(fig, use_container_width=True, key="bar_yoy_custos")
+
+@fragment
+@PROFILER.timed()
+def render_raiox_detalhe(snapshot, cube, ano):
+    # Fragmento: trocar Grupo/Mês só reexecuta este sunburst, não a página inteira
+    sel_macro = st.selectbox("Grupo:", sorted(real_expenses(cube)['Macro_Grupo'].unique()), key="sel_macro")
+    sel_mes = st.selectbox("Mês:", ["Todos os meses (soma anual)"] + snapshot.index.months(ano), key="sel_mes_raiox")
+    
+    # O mês (ou o ano) sai do índice de períodos como view; só essa fatia é filtrada
+    if sel_mes == "Todos os meses (soma anual)":
+        base = snapshot.index.year(snapshot.df, ano)
+    else:
+        base = snapshot.index.month(snapshot.df, sel_mes, ano)
+    df_d = base[base['is_real_expense'] & (base['Macro_Grupo'] == sel_macro)].assign(Valor_Abs=lambda d: d['Valor'].abs())
+        
+    if not df_d.empty:
+        # Uma fatia por transação não escala com o histórico: fica o top-N por Tipo e o resto vira "Outros"
+        caminho = ['Macro_Grupo', 'Tipo', 'Transação']
+        top_n = st.slider("Fatias por grupo:", 3, 50, TOP_N_GRAFICOS, key="top_n_raiox")
+        df_sun = top_n_rollup(df_d, caminho, 'Valor_Abs', n=top_n)
+
+        # O TRUQUE DO DEGRADÊ: 
+        # 1. O path começa no Macro_Grupo
+        # 2. Usamos color_discrete_sequence para passar a cor exata do macro.
+        # O Plotly automaticamente gera o degradê para as fatias filhas!
+        fig_sun = px.sunburst(
+            df_sun, 
+            path=caminho,
+            values='Valor_Abs', 
+            color_discrete_sequence=[MAPA_CORES_MACRO.get(sel_macro, "#8D99AE")],
+            title=f"<b>{sel_macro} em {sel_mes}/{ano}</b>" if sel_mes in MONTHS_ORDER else f"<b>{sel_macro} em {ano}</b>",
+            height=500
+        )
+        fig_sun.update_traces(
+            hovertemplate="<b>%{label}</b><br>Valor: R$ %{value:,.2f}<extra></extra>",
+            root_color="white" # 3. Deixa SOMENTE a primeira camada (Macro_Grupo) com fundo branco
+        )
+        fig_sun.update_layout(title_font=dict(size=24, family="sans-serif"), title_x=0)
+        fig_sun.update_layout(separators=",.", margin=dict(t=60, l=10, r=10, b=10))
+        plotly_chart(fig_sun, use_container_width=True, key="sun_raiox")
+
+        # Drill-down: abre um nó "Outros" e lista o que foi agrupado nele
+        outros = {}
+        for nivel in range(1, len(caminho)):
+            for pai in df_sun.loc[df_sun[caminho[nivel]] == OUTROS, caminho[:nivel]].drop_duplicates().itertuples(index=False):
+                outros[" › ".join(pai) + " › Outros"] = (nivel, tuple(pai))
+        if outros:
+            sel_outros = st.selectbox("Detalhar \"Outros\":", ["—"] + list(outros), key="sel_outros_raiox")
+            if sel_outros != "—":
+                nivel, pai = outros[sel_outros]
+                df_outros = rollup_detail(df_d, caminho[:nivel + 1], 'Valor_Abs', pai, n=top_n)
+                render_table(df_outros.rename(columns={'Valor_Abs': 'Valor'}), "tab_outros", sort_by='Valor', ascending=False,
+                             search_columns=(caminho[nivel],))
+
+@PROFILER.timed()
+def render_raiox(snapshot, cube, ano):
     col1, col2 = st.columns(2)
     with col1:
-        df_evol = df_gastos.groupby(['Mes_Pagamento', 'Macro_Grupo'], observed=True)['Valor_Abs'].sum().reset_index()
-        df_evol['Mes_Pagamento'] = pd.Categorical(df_evol['Mes_Pagamento'], categories=MONTHS_ORDER, ordered=True)
+        df_evol = monthly(real_expenses(cube), 'Saidas', by=['Macro_Grupo'])
+        df_evol['Valor_Abs'] = df_evol['Saidas'].abs()
         
         # Gráfico Empilhado
         fig = px.bar(
-            df_evol.sort_values('Mes_Pagamento'), 
+            df_evol, 
             x='Mes_Pagamento', 
             y='Valor_Abs', 
             color='Macro_Grupo', 
@@ -318,50 +425,16 @@ def render_raiox(df):
         fig.update_traces(hovertemplate="Grupo: %{fullData.name}<br>Valor: R$ %{y:,.2f}<extra></extra>")
         fig.update_layout(title_font=dict(size=24, family="sans-serif"), title_x=0)
         fig.update_layout(separators=",.", xaxis_title=None, yaxis_title="Valor (R$)")
-        st.plotly_chart(fig, use_container_width=True, key="bar_raiox")
+        plotly_chart(fig, use_container_width=True, key="bar_raiox")
     
     with col2:
-        sel_macro = st.selectbox("Grupo:", sorted(df_gastos['Macro_Grupo'].unique()), key="sel_macro")
-        sel_mes = st.selectbox("Mês:", ["Todos os meses (soma anual)"] + MONTHS_ORDER, key="sel_mes_raiox")
-        
-        df_d = df_gastos[df_gastos['Macro_Grupo'] == sel_macro].copy()
-        if sel_mes != "Todos os meses (soma anual)": 
-            df_d = df_d[df_d['Mes_Pagamento'] == sel_mes]
-            
-        if not df_d.empty:
-            # O TRUQUE DO DEGRADÊ: 
-            # 1. O path começa no Macro_Grupo
-            # 2. Usamos color_discrete_sequence para passar a cor exata do macro.
-            # O Plotly automaticamente gera o degradê para as fatias filhas!
-            fig_sun = px.sunburst(
-                df_d, 
-                path=['Macro_Grupo', 'Tipo', 'Transação'],
-                values='Valor_Abs', 
-                color_discrete_sequence=[MAPA_CORES_MACRO[sel_macro]],
-                title=f"<b>{sel_macro} em {sel_mes}</b>",
-                height=500
-            )
-            fig_sun.update_traces(
-                hovertemplate="<b>%{label}</b><br>Valor: R$ %{value:,.2f}<extra></extra>",
-                root_color="white" # 3. Deixa SOMENTE a primeira camada (Macro_Grupo) com fundo branco
-            )
-            fig_sun.update_layout(title_font=dict(size=24, family="sans-serif"), title_x=0)
-            fig_sun.update_layout(separators=",.", margin=dict(t=60, l=10, r=10, b=10))
-            st.plotly_chart(fig_sun, use_container_width=True, key="sun_raiox")
+        render_raiox_detalhe(snapshot, cube, ano)
 
     st.divider()
     
-    # Filtros de Favorecido
-    meu_nome = st.secrets.get("MEU_NOME", "Usuario") # Puxa do cofre seguro
-    
-    filtros_fav = (
-        (df_gastos['Favorecido'] != "N/A") & 
-        (~df_gastos['Favorecido'].str.contains(meu_nome, case=False, na=False)) &
-        (~df_gastos['Favorecido'].str.contains("Cartão|Cartao", case=False, na=False)) &
-        (~df_gastos['Tipo'].str.contains("Pagamento de cartão", case=False, na=False))
-    )
-    
-    df_fav = df_gastos[filtros_fav].groupby('Favorecido')['Valor_Abs'].sum().nlargest(10).reset_index()
+    # Ranking de Favorecidos (sem faturas de cartão nem o próprio nome), do índice de favorecidos
+    aliases = tuple(sorted((nome, tuple(grafias)) for nome, grafias in SETTINGS.aliases_favorecidos.items()))
+    df_fav = cached("get_payees", get_payees, snapshot.version, ano, SETTINGS.meu_nome, aliases, snapshot).top(ano, n=10)
     
     if df_fav.empty:
         st.info("Nenhum 'Favorecido' preenchido nos registros para gerar o ranking após os filtros.")
@@ -375,7 +448,7 @@ def render_raiox(df):
             color='Valor_Abs', # Ativa o degradê de intensidade
             color_continuous_scale=["#FFD6E0", "#EF476F", "#8A0A2A"], 
             text='Valor_Abs',  
-            title="<b>Top 10 Maiores Favorecidos neste ano</b>",
+            title=f"<b>Top 10 Maiores Favorecidos em {ano}</b>",
             height=600         
         )
         
@@ -395,39 +468,19 @@ def render_raiox(df):
         )
         fig_fav.update_layout(separators=",.", xaxis_title=None, yaxis_title=None)
         
-        st.plotly_chart(fig_fav, use_container_width=True, key="top_fav")
+        plotly_chart(fig_fav, use_container_width=True, key="top_fav")
         
+@PROFILER.timed()
 def render_projeções_completo(df):
     #st.header("🔮 Projeções Futuras")
-    df_parcelas = df[df['Parcela'].astype(str).str.contains('/')].copy()
-    if df_parcelas.empty:
+    df_proj = project_installments(df)
+    if df_proj.empty:
         st.info("Nenhuma parcela detectada.")
         return
-
-    projections = []
-    current_month_idx = datetime.datetime.now().month - 1
-    for _, row in df_parcelas.iterrows():
-        try:
-            atual, total = map(int, row['Parcela'].split('/'))
-            for i in range(total - atual + 1):
-                # 1. Calcula a parcela exata do mês projetado
-                parcela_calculada = f"{atual + i}/{total}"
-                
-                projections.append({
-                    'Mes': MONTHS_ORDER[(current_month_idx + i) % 12],
-                    'Valor': abs(row['Valor']), 
-                    'Transação': row['Transação'], 
-                    'Banco': row['Banco'],
-                    'Parcela': parcela_calculada # <--- Adicionando à tabela
-                })
-        except: continue
-    
-    df_proj = pd.DataFrame(projections)
-    df_proj['Mes'] = pd.Categorical(df_proj['Mes'], categories=MONTHS_ORDER, ordered=True)
     
     # 2. Gráfico de Linha na cor vermelha/vibrante da paleta
     fig_line = px.line(
-        df_proj.groupby('Mes', observed=True)['Valor'].sum().reset_index(), 
+        df_proj.groupby(['Periodo', 'Mes'])['Valor'].sum().reset_index(), 
         x='Mes', 
         y='Valor', 
         title="<b>Custo Fixo Futuro</b>", 
@@ -436,35 +489,31 @@ def render_projeções_completo(df):
     )
     fig_line.update_layout(title_font=dict(size=24, family="sans-serif"), title_x=0)
     fig_line.update_layout(separators=",.")
-    st.plotly_chart(fig_line, use_container_width=True, key="line_proj")
+    plotly_chart(fig_line, use_container_width=True, key="line_proj")
     
+    render_projecao_detalhe(df_proj)
+
+@fragment
+@PROFILER.timed()
+def render_projecao_detalhe(df_proj):
+    # Fragmento: trocar o mês só reexecuta a tabela de detalhe
     mes_sel = st.selectbox("Detalhar mês futuro:", df_proj['Mes'].unique(), key="sel_mes_proj")
     
-    # 3. Filtrando o mês selecionado e aplicando formato brasileiro no valor
-    df_show = df_proj[df_proj['Mes'] == mes_sel].sort_values('Valor', ascending=False).copy()
-    df_show['Valor'] = df_show['Valor'].apply(formata_br)
+    # 3. Filtrando o mês selecionado; o formato brasileiro do valor é aplicado só na exibição
+    df_show = df_proj[df_proj['Mes'] == mes_sel]
     
     # Exibindo a tabela com a coluna 'Parcela' visível e na ordem mais lógica
-    st.dataframe(df_show[['Transação', 'Banco', 'Parcela', 'Valor']], hide_index=True, use_container_width=True)
+    render_table(df_show[['Transação', 'Banco', 'Parcela', 'Valor']], "tab_proj", sort_by='Valor', ascending=False,
+                 search_columns=('Transação', 'Banco'))
 
-def render_metas(df):
-    meses_disp = [m for m in MONTHS_ORDER if m in df['Mes_Pagamento'].unique()]
-    mes_atual = MONTHS_ORDER[datetime.datetime.now().month - 1]
-    idx = meses_disp.index(mes_atual) if mes_atual in meses_disp else 0
-    idx = idx - 1
-    mes_sel = st.selectbox("Mês de Avaliação:", meses_disp, index=idx, key="sel_mes_metas")
-    
-    df_mes = df[df['Mes_Pagamento'] == mes_sel].copy()
+@PROFILER.timed()
+def render_metas(cube_mes):
 
     # --- 1. INVESTIMENTOS ---
     st.subheader("📈 Meta de Investimentos")
     
-    saldo_investimentos = df_mes[df_mes['Macro_Grupo'] == "Investimentos"]['Valor'].sum()
-    total_investido = abs(saldo_investimentos) if saldo_investimentos < 0 else 0
-    
-    # Cálculo do delta de investimentos
-    diff_inv = total_investido - META_INVESTIMENTOS 
-    percent_inv = (total_investido / META_INVESTIMENTOS) * 100 if META_INVESTIMENTOS > 0 else 0
+    meta_inv = investment_goal(cube_mes, META_INVESTIMENTOS)
+    total_investido, diff_inv, percent_inv = meta_inv['realizado'], meta_inv['diferenca'], meta_inv['atingimento']
     
     # Correção: Forçando o sinal de menos no início absoluto da string para o Streamlit entender
     if diff_inv < 0:
@@ -486,49 +535,29 @@ def render_metas(df):
     # --- 2. CUSTOS ---
     st.subheader("🛑 Orçamento e Teto de Gastos")
     
-    filtro_saidas = (
-        (df_mes['Valor'] < 0) & 
-        (df_mes['Macro_Grupo'] != "Investimentos") & 
-        (~df_mes['Tipo'].astype(str).str.contains("Pagamento de cartão", case=False, na=False))
-    )
-    df_gastos = df_mes[filtro_saidas]
+    # Gasto x teto por grupo (analytics.budget): dentro da meta, folga e estouro
+    orcamento = budget(cube_mes, METAS_CUSTOS)
     
-    col_list = st.columns(len(METAS_CUSTOS))
-    dados_grafico = []
-    
-    for i, (cat, meta_valor) in enumerate(METAS_CUSTOS.items()):
-        gasto_real = df_gastos[df_gastos['Macro_Grupo'] == cat]['Valor'].abs().sum()
-        
-        # Lógica rigorosa de Sobra e Estouro
-        if gasto_real <= meta_valor:
-            sobra_real = meta_valor - gasto_real
-            delta_string = f"R$ {formata_br(sobra_real)} (Sobra)"
-            
-            # Para o gráfico empilhado
-            dados_grafico.append({"Categoria": cat, "Tipo": "Gasto dentro da meta", "Valor": gasto_real})
-            dados_grafico.append({"Categoria": cat, "Tipo": "Folga (Disponível)", "Valor": sobra_real})
-            dados_grafico.append({"Categoria": cat, "Tipo": "Estouro", "Valor": 0})
+    col_list = st.columns(len(orcamento))
+    for i, linha in enumerate(orcamento.itertuples()):
+        if linha.Estouro > 0:
+            delta_string = f"-R$ {formata_br(linha.Estouro)} (Estouro)" # Forçamos o sinal negativo na string
         else:
-            estouro = gasto_real - meta_valor
-            delta_string = f"-R$ {formata_br(estouro)} (Estouro)" # Forçamos o sinal negativo na string
-            
-            # Para o gráfico empilhado
-            dados_grafico.append({"Categoria": cat, "Tipo": "Gasto dentro da meta", "Valor": meta_valor})
-            dados_grafico.append({"Categoria": cat, "Tipo": "Folga (Disponível)", "Valor": 0})
-            dados_grafico.append({"Categoria": cat, "Tipo": "Estouro", "Valor": estouro})
+            delta_string = f"R$ {formata_br(linha.Folga)} (Sobra)"
 
         with col_list[i]:
             # delta_color="normal" aqui, junto com o sinal negativo na string que forçamos acima,
             # garante que um Estouro fique vermelho apontando para baixo. E a sobra fique verde!
             st.metric(
-                label=f"Teto: {cat}", 
-                value=f"R$ {formata_br(gasto_real)}", 
+                label=f"Teto: {linha.Categoria}", 
+                value=f"R$ {formata_br(linha.Gasto)}", 
                 delta=delta_string, 
                 delta_color="normal" 
             )
     
     # Gráfico Comparativo Empilhado (Bullet Chart)
-    df_plot = pd.DataFrame(dados_grafico)
+    df_plot = orcamento.melt(id_vars='Categoria', value_vars=['Gasto_Na_Meta', 'Folga', 'Estouro'], var_name='Tipo', value_name='Valor')
+    df_plot['Tipo'] = df_plot['Tipo'].map({"Gasto_Na_Meta": "Gasto dentro da meta", "Folga": "Folga (Disponível)", "Estouro": "Estouro"})
     
     fig_metas = px.bar(
         df_plot, 
@@ -550,52 +579,34 @@ def render_metas(df):
     fig_metas.update_layout(separators=",.", xaxis_title=None, yaxis_title=None)
     fig_metas.update_layout(legend_title_text=None) # Remove o título da legenda pra ficar mais limpo
     
-    st.plotly_chart(fig_metas, use_container_width=True, key="bar_metas")
+    plotly_chart(fig_metas, use_container_width=True, key="bar_metas")
 
-def render_patrimonio(df):
+def passivo(conta):
+    # Dívida em janeiro, esforço de pagamento no ano, saldo estimado (sem juros) e pagamentos por mês
+    pagamentos = conta['mensal'][conta['mensal']['Impacto'] < 0]
+    return {"divida": conta['abertura'], "pago": -conta['movimento'], "saldo_estimado": conta['saldo'],
+            "pagamentos": pagamentos.assign(Valor_Abs=-pagamentos['Impacto'])}
+
+@PROFILER.timed()
+def render_patrimonio(patrimonio, ano):
     st.header("🏡 Evolução Patrimonial")
     
-    # --- PREPARAÇÃO DE DADOS BASE ---
-    # 1. Ativos (Renda Fixa + Rendimentos)
-    df_rf = df[df['Tipo'].isin(['Renda fixa', 'Rendimento'])].copy()
-    
-    # Função blindada para garantir que Resgates diminuam o patrimônio e Aportes/Rendimentos aumentem
-    def calcula_impacto_rf(row):
-        if row['Tipo'] == 'Rendimento':
-            return abs(row['Valor']) # Rendimento: Faz o bolo crescer
-        elif row['Tipo'] == 'Renda fixa' and row['Valor'] < 0:
-            return abs(row['Valor']) # Aporte: Faz o bolo crescer
-        elif row['Tipo'] == 'Renda fixa' and row['Valor'] > 0:
-            return -abs(row['Valor']) # Resgate: Tira do bolo
-        return 0
-        
-    if not df_rf.empty:
-        df_rf['Impacto'] = df_rf.apply(calcula_impacto_rf, axis=1)
-        crescimento_rf_ano = df_rf['Impacto'].sum()
-    else:
-        df_rf['Impacto'] = 0
-        crescimento_rf_ano = 0
-        
-    saldo_atual_rf = SALDO_INICIAL_RENDA_FIXA + crescimento_rf_ano
-    
-    # 2. Passivos (Casa)
-    df_casa = df[(df['Tipo'] == 'Moradia') & (df['Valor'] < 0)].copy()
-    df_casa['Valor_Abs'] = df_casa['Valor'].abs()
-    pago_ano_casa = df_casa['Valor_Abs'].sum()
-    
-    # 3. Passivos (Terreno)
-    df_terreno = df[(df['Tipo'] == 'Imóveis') & (df['Valor'] < 0)].copy()
-    df_terreno['Valor_Abs'] = df_terreno['Valor'].abs()
-    pago_ano_terreno = df_terreno['Valor_Abs'].sum()
+    # --- PREPARAÇÃO DE DADOS BASE (ledger.Ledger.position) ---
+    # Ativos: Renda Fixa + Rendimentos (resgates diminuem; aportes e rendimentos aumentam)
+    # Passivos: o que foi pago no ano em Moradia (Casa) e Imóveis (Terreno)
+    # Saldos de abertura: os de janeiro do ano escolhido, rolados a partir dos secrets
+    rf = patrimonio['contas']['Renda fixa']
+    saldo_inicial_rf, saldo_atual_rf, crescimento_rf_ano = rf['abertura'], rf['saldo'], rf['movimento']
+    casa, terreno = (passivo(patrimonio['contas'][conta]) for conta in ('Moradia', 'Imóveis'))
     
     # --- GRANDE RESUMO: PATRIMÔNIO LÍQUIDO ---
     # Ativos totais menos a Dívida Real do banco
-    patrimonio_liquido = saldo_atual_rf - DIVIDA_ATUAL_CASA - DIVIDA_ATUAL_TERRENO
+    patrimonio_liquido = patrimonio['patrimonio_liquido']
     
     st.metric(
         label="Patrimônio Líquido Total (Ativos - Dívidas Reais)",
         value=f"R$ {formata_br(patrimonio_liquido)}",
-        delta="Atualize os saldos devedores no código para a métrica ser exata",
+        delta=f"Saldos informados para janeiro/{SETTINGS.ano_saldos}; atualize-os nos secrets para a métrica ser exata",
         delta_color="off"
     )
     
@@ -609,23 +620,18 @@ def render_patrimonio(df):
     st.metric(
         label="Saldo Acumulado Estimado", 
         value=f"R$ {formata_br(saldo_atual_rf)}", 
-        delta=f"R$ {formata_br(crescimento_rf_ano)} (Crescimento líquido no ano)", 
+        delta=f"R$ {formata_br(crescimento_rf_ano)} (Crescimento líquido em {ano})", 
         delta_color="normal"
     )
     
-    if not df_rf.empty:
-        # Agrupa o impacto (já com os sinais corretos)
-        df_evol_rf = df_rf.groupby('Mes_Pagamento', observed=True)['Impacto'].sum().reset_index()
-        df_evol_rf['Mes_Pagamento'] = pd.Categorical(df_evol_rf['Mes_Pagamento'], categories=MONTHS_ORDER, ordered=True)
-        df_evol_rf = df_evol_rf.sort_values('Mes_Pagamento')
-        
-        df_evol_rf['Acumulado_Ano'] = df_evol_rf['Impacto'].cumsum()
-        df_evol_rf['Saldo_Evolucao'] = SALDO_INICIAL_RENDA_FIXA + df_evol_rf['Acumulado_Ano']
+    # Impacto mensal (já com os sinais corretos) acumulado sobre o saldo inicial
+    df_evol_rf = rf['mensal']
+    if not df_evol_rf.empty:
         
         fig_rf = px.area(
             df_evol_rf, 
             x='Mes_Pagamento', 
-            y='Saldo_Evolucao', 
+            y='Saldo', 
             title="<b>Evolução do Saldo (Renda Fixa)</b>", 
             color_discrete_sequence=["#3A86FF"], 
             markers=True
@@ -634,9 +640,9 @@ def render_patrimonio(df):
         fig_rf.update_layout(title_font=dict(size=18, family="sans-serif"), separators=",.", xaxis_title=None, yaxis_title=None)
         
         # Trava o fundo do gráfico para evidenciar o crescimento
-        min_y = SALDO_INICIAL_RENDA_FIXA * 0.95 if SALDO_INICIAL_RENDA_FIXA > 0 else 0
-        fig_rf.update_yaxes(range=[min_y, max(df_evol_rf['Saldo_Evolucao']) * 1.05])
-        st.plotly_chart(fig_rf, use_container_width=True, key="area_rf")
+        min_y = saldo_inicial_rf * 0.95 if saldo_inicial_rf > 0 else 0
+        fig_rf.update_yaxes(range=[min_y, max(df_evol_rf['Saldo']) * 1.05])
+        plotly_chart(fig_rf, use_container_width=True, key="area_rf")
 
     st.divider()
 
@@ -644,29 +650,26 @@ def render_patrimonio(df):
     # 2. PASSIVOS (O que você está pagando)
     # ==========================================
     st.subheader("🛑 Passivos: Esforço de Pagamento")
-    st.caption("Como as parcelas incluem juros e taxas, a dívida real difere do valor gasto. O gráfico abaixo mostra o volume total de dinheiro que você já injetou no pagamento este ano (Esforço de Caixa).")
+    st.caption(f"Como as parcelas incluem juros e taxas, a dívida real difere do valor gasto. O gráfico abaixo mostra o volume total de dinheiro que você já injetou no pagamento em {ano} (Esforço de Caixa).")
     
     c1, c2 = st.columns(2)
 
     with c1:
         st.markdown("#### 🏠 Casa")
         # Cálculo da estimativa sem juros
-        saldo_estimado_casa = DIVIDA_ATUAL_CASA - pago_ano_casa
+        pago_ano_casa, saldo_estimado_casa = casa['pago'], casa['saldo_estimado']
         
         st.metric(
-            label="Dívida em Janeiro/2026", 
-            value=f"R$ {formata_br(DIVIDA_ATUAL_CASA)}", 
-            delta=f"R$ {formata_br(pago_ano_casa)} (Esforço total no ano)", 
+            label=f"Dívida em Janeiro/{ano}", 
+            value=f"R$ {formata_br(casa['divida'])}", 
+            delta=f"R$ {formata_br(pago_ano_casa)} (Esforço total em {ano})", 
             delta_color="normal" # Fica verde porque pagar é um esforço positivo!
         )
         # Novo label com o saldo estimado
         st.caption(f"📉 **Saldo atual estimado (sem juros):** R$ {formata_br(saldo_estimado_casa)}")
 
-        if not df_casa.empty:
-            df_evol_casa = df_casa.groupby('Mes_Pagamento', observed=True)['Valor_Abs'].sum().reset_index()
-            df_evol_casa['Mes_Pagamento'] = pd.Categorical(df_evol_casa['Mes_Pagamento'], categories=MONTHS_ORDER, ordered=True)
-            df_evol_casa = df_evol_casa.sort_values('Mes_Pagamento')
-            
+        df_evol_casa = casa['pagamentos']
+        if not df_evol_casa.empty:
             # Gráfico apontando para o Valor_Abs (pagamento mensal exato)
             fig_casa = px.area(
                 df_evol_casa, 
@@ -678,27 +681,24 @@ def render_patrimonio(df):
             )
             fig_casa.update_traces(hovertemplate="Mês: %{x}<br>Pago no Mês: R$ %{y:,.2f}<extra></extra>")
             fig_casa.update_layout(title_font=dict(size=16, family="sans-serif"), separators=",.", xaxis_title=None, yaxis_title=None)
-            st.plotly_chart(fig_casa, use_container_width=True, key="area_casa")
+            plotly_chart(fig_casa, use_container_width=True, key="area_casa")
 
     with c2:
         st.markdown("#### ⛰️ Terreno")
         # Cálculo da estimativa sem juros
-        saldo_estimado_terreno = DIVIDA_ATUAL_TERRENO - pago_ano_terreno
+        pago_ano_terreno, saldo_estimado_terreno = terreno['pago'], terreno['saldo_estimado']
         
         st.metric(
-            label="Dívida em Janeiro/2026", 
-            value=f"R$ {formata_br(DIVIDA_ATUAL_TERRENO)}", 
-            delta=f"R$ {formata_br(pago_ano_terreno)} (Esforço total no ano)", 
+            label=f"Dívida em Janeiro/{ano}", 
+            value=f"R$ {formata_br(terreno['divida'])}", 
+            delta=f"R$ {formata_br(pago_ano_terreno)} (Esforço total em {ano})", 
             delta_color="normal"
         )
         # Novo label com o saldo estimado
         st.caption(f"📉 **Saldo atual estimado (sem juros):** R$ {formata_br(saldo_estimado_terreno)}")
 
-        if not df_terreno.empty:
-            df_evol_terreno = df_terreno.groupby('Mes_Pagamento', observed=True)['Valor_Abs'].sum().reset_index()
-            df_evol_terreno['Mes_Pagamento'] = pd.Categorical(df_evol_terreno['Mes_Pagamento'], categories=MONTHS_ORDER, ordered=True)
-            df_evol_terreno = df_evol_terreno.sort_values('Mes_Pagamento')
-            
+        df_evol_terreno = terreno['pagamentos']
+        if not df_evol_terreno.empty:
             # Gráfico apontando para o Valor_Abs (pagamento mensal exato)
             fig_terreno = px.area(
                 df_evol_terreno, 
@@ -710,44 +710,196 @@ def render_patrimonio(df):
             )
             fig_terreno.update_traces(hovertemplate="Mês: %{x}<br>Pago no Mês: R$ %{y:,.2f}<extra></extra>")
             fig_terreno.update_layout(title_font=dict(size=16, family="sans-serif"), separators=",.", xaxis_title=None, yaxis_title=None)
-            st.plotly_chart(fig_terreno, use_container_width=True, key="area_terreno")
+            plotly_chart(fig_terreno, use_container_width=True, key="area_terreno")
     
 # --- MAIN ---
+def known_years():
+    # Sem esperar pelo histórico: os anos do snapshot já carregado (se houver) e o ano corrente
+    snapshot = get_dataset().current
+    anos = {datetime.date.today().year} | (set(snapshot.index.years) if snapshot is not None else set())
+    return sorted(anos, reverse=True)
+
+def load_month(label, key, offset=0):
+    """Seletores de mês e ano (o corrente, deslocado `offset` meses, por padrão).
+
+    O mês sai do snapshot do dataset quando já existe um; antes da primeira carga, busca no
+    Notion só a partição escolhida.
+    """
+    hoje = datetime.datetime.now()
+    # Deslocamento sobre o período (ano * 12 + mês): em janeiro, offset=-1 é dezembro do ano anterior
+    padrao = hoje.year * 12 + hoje.month - 1 + offset
+    anos = sorted(set(known_years()) | {padrao // 12}, reverse=True)
+    c1, c2 = st.columns([3, 1])
+    mes_sel = c1.selectbox(label, MONTHS_ORDER, index=padrao % 12, key=key)
+    ano_sel = c2.selectbox("Ano:", anos, index=anos.index(padrao // 12), key=f"{key}_ano")
+    dataset = get_dataset()
+    if dataset.current is None and not MODO_OFFLINE:
+        # Ainda sem snapshot (primeira carga do processo): só a partição escolhida vem do Notion
+        try:
+            with st.spinner("Sincronizando..."):
+                df_mes = cached("fetch_month", fetch_month, mes_sel, ano_sel, cached("data_version", data_version))
+        except Exception as exc:
+            st.error(f"Não foi possível carregar os dados do Notion: {exc}")
+            st.stop()
+    else:
+        # Com snapshot o mês é uma fatia dele, sem esperar o Notion; o refresher revalida em segundo plano
+        if dataset.current is None:
+            st.error("Não foi possível carregar os dados do Notion: modo offline sem snapshot salvo")
+            st.stop()
+        snapshot = dataset.get()
+        if dataset.offline:
+            st.caption(f"📦 Modo offline: exibindo o snapshot de {snapshot.loaded_at:%d/%m %H:%M}")
+        elif dataset.last_error is not None:
+            st.caption(f"⚠️ Última atualização falhou, exibindo os dados de {snapshot.loaded_at:%d/%m %H:%M}: {dataset.last_error}")
+        df_mes = snapshot.index.month(snapshot.df, mes_sel, ano_sel)
+    if df_mes.empty:
+        st.info(f"Sem lançamentos em {mes_sel}/{ano_sel}.")
+    return df_mes
+
+def load_history():
+    # Histórico completo: só é baixado quando uma aba que precisa dele é aberta.
+    # Depois da primeira carga, a versão anterior é servida enquanto a nova é buscada.
+    dataset = get_dataset()
+    try:
+        if dataset.current is None:
+            with st.spinner("Sincronizando..."):
+                snapshot = dataset.get()
+        else:
+            snapshot = dataset.get()
+    except Exception as exc:
+        st.error(f"Não foi possível carregar os dados do Notion: {exc}")
+        st.stop()
+
+    status = f"Dados de {snapshot.loaded_at:%d/%m %H:%M}"
+    if dataset.offline:
+        status += " · 📦 modo offline (snapshot local)"
+    elif dataset.refreshing:
+        status += " · atualizando em segundo plano..."
+    st.caption(status)
+    if dataset.last_error is not None:
+        st.caption(f"⚠️ Última atualização falhou, exibindo os dados anteriores: {dataset.last_error}")
+
+    if snapshot.df.empty:
+        st.warning("Sem dados.")
+        st.stop()
+    return snapshot
+
+# Abas mensais como fragmentos: trocar o mês não reexecuta título, navegação nem autenticação
+@fragment
+def aba_saude():
+    df_mes = load_month("Mês:", "sel_mes_saude")
+    if not df_mes.empty:
+        render_saude(df_mes)
+
+@fragment
+def aba_metas():
+    df_mes = load_month("Mês de Avaliação:", "sel_mes_metas", offset=-1)
+    if not df_mes.empty:
+        render_metas(build_cube(df_mes))
+
 def main():
     st.title("Controle Financeiro")
-    client = NotionClient()
-    with st.spinner("Sincronizando..."):
-        df = process_data(client.fetch_all_pages())
-
-    if df.empty:
-        st.warning("Sem dados.")
-        return
 
     opcoes_menu = ["🩺 Saúde financeira", "📊 Histórico", "🕵🏻‍♂️ Raio-X de custos", "🔮 Projeções", "🏡 Patrimônio", "🎯 Metas"]
     aba_ativa = st.radio("Navegação", opcoes_menu, horizontal=True, label_visibility="collapsed")
     st.divider()
 
     if aba_ativa == "🩺 Saúde financeira":
-        meses_disp = [m for m in MONTHS_ORDER if m in df['Mes_Pagamento'].unique()]
-        mes_atual = MONTHS_ORDER[datetime.datetime.now().month - 1]
-        idx = meses_disp.index(mes_atual) if mes_atual in meses_disp else 0
-        mes_sel = st.selectbox("Mês:", meses_disp, index=idx, key="sel_mes_saude")
-        render_saude(df[df['Mes_Pagamento'] == mes_sel])
+        aba_saude()
+        return
+
+    if aba_ativa == "🎯 Metas":
+        aba_metas()
+        return
 
-    elif aba_ativa == "📊 Histórico":
-        render_historico(df)
+    # As demais abas olham o histórico inteiro
+    snapshot = load_history()
 
-    elif aba_ativa == "🕵🏻‍♂️ Raio-X de custos":
-        render_raiox(df)
+    if aba_ativa == "🔮 Projeções":
+        render_projeções_completo(snapshot.df)
+        return
 
-    elif aba_ativa == "🔮 Projeções":
-        render_projeções_completo(df)
-        
-    elif aba_ativa == "🎯 Metas":
-        render_metas(df)
+    # Histórico, Raio-X e Patrimônio mostram um ano por vez; cada ano é carregado sob demanda
+    anos = snapshot.index.years
+    hoje = datetime.date.today().year
+    ano = st.selectbox("Ano:", anos[::-1], index=anos[::-1].index(hoje) if hoje in anos else 0, key="sel_ano")
+    cube_of = lambda a: cached("get_year", get_year, snapshot.version, a, snapshot)[1]
+    df_ano, cube_ano = cached("get_year", get_year, snapshot.version, ano, snapshot)
+
+    if aba_ativa == "📊 Histórico":
+        render_historico(df_ano, cube_ano, ano)
+        st.divider()
+        render_comparativo(anos, ano, cube_of)
+
+    elif aba_ativa == "🕵🏻‍♂️ Raio-X de custos":
+        render_raiox(snapshot, cube_ano, ano)
 
     elif aba_ativa == "🏡 Patrimônio":
-        render_patrimonio(df)
+        # O razão é compartilhado: uma versão nova do snapshot só aplica os lançamentos que mudaram
+        with PROFILER.span("ledger.sync"):
+            ledger = get_ledger().sync(snapshot.df, snapshot.version)
+        render_patrimonio(ledger.position(ano, SETTINGS.opening_balances()), ano)
         
+# --- PAINEL DE DEBUG ---
+def debug_enabled():
+    # Escondido: só aparece com DEBUG nos secrets ou ?debug=1 na URL
+    return flag(st.secrets.get("DEBUG", False)) or st.query_params.get("debug") == "1"
+
+def profiling_on():
+    return debug_enabled() and st.session_state.get("debug_profiler", True)
+
+def cache_stats():
+    """Chamadas, hits e misses de cada função em cache, a partir dos contadores do profiler."""
+    nomes = {chave.split(".")[1] for chave in PROFILER.counters if chave.startswith("cache.")}
+    linhas = []
+    for nome in sorted(nomes):
+        chamadas, misses = PROFILER.counters[f"cache.{nome}.calls"], PROFILER.counters[f"cache.{nome}.misses"]
+        linhas.append({"cache": nome, "calls": chamadas, "hits": max(chamadas - misses, 0), "misses": misses})
+    return linhas
+
+def memory_stats():
+    """Memória (MB, deep) dos DataFrames mantidos em cache pelo processo."""
+    snapshot = get_dataset().current
+    if snapshot is None:
+        return {}
+    mb = lambda df: round(df.memory_usage(deep=True).sum() / 2**20, 3)
+    anos = snapshot.index.years
+    cubo = get_year(snapshot.version, anos[-1], snapshot)[1] if anos else snapshot.df.iloc[:0]
+    return {"dataset": mb(snapshot.df), "cube_ultimo_ano": mb(cubo), "linhas": len(snapshot.df), "anos": anos}
+
+def render_debug_panel():
+    with st.sidebar:
+        st.subheader("🛠️ Debug")
+        if not st.toggle("Instrumentação", value=True, key="debug_profiler"):
+            return
+        st.caption("Spans acumulados desde o último reset (s)")
+        st.dataframe(pd.DataFrame(PROFILER.summary()), hide_index=True)
+
+        http = {} if MODO_OFFLINE else get_client().transport.stats.snapshot()
+        extras = {"http": http, "cache": cache_stats(), "dataset": get_dataset().stats(), "memoria_mb": memory_stats()}
+        st.caption("HTTP (Notion)")
+        st.json(http, expanded=False)
+        st.caption("Caches")
+        st.dataframe(pd.DataFrame(extras["cache"]), hide_index=True)
+        st.json(extras["dataset"], expanded=False)
+        st.caption("Memória dos DataFrames (MB)")
+        st.json(extras["memoria_mb"], expanded=False)
+        if get_dataset().current is not None:
+            st.caption("Memória por coluna do dataset")
+            st.dataframe(memory_report(get_dataset().current.df), hide_index=True)
+
+        c1, c2, c3 = st.columns(3)
+        c1.download_button("JSON", PROFILER.to_json(**extras), file_name="profile.json", mime="application/json")
+        c2.download_button("CSV", PROFILER.to_csv(), file_name="spans.csv", mime="text/csv")
+        if c3.button("Reset"):
+            PROFILER.reset()
+
 if __name__ == "__main__":
-    if check_password(): main()
+    if check_password():
+        debug = debug_enabled()
+        # Liga a instrumentação só nesta execução (e nesta sessão), antes de rodar a página
+        with PROFILER.recording(profiling_on()):
+            with PROFILER.span("script_run"):
+                main()
+            if debug:
+                render_debug_panel()
@@ -0,0 +1,100 @@
+"""Latência de rerun ao mexer nos widgets interativos: script inteiro vs. só o fragmento.
+
+Roda o app com o Streamlit AppTest e dados sintéticos (sem Notion). "script inteiro" é o
+que acontecia antes dos fragmentos: qualquer widget reexecutava tudo; "fragmento" é o
+custo de reexecutar apenas a função decorada com @st.fragment.
+
+Uso: python benchmarks/bench_reruns.py [n_paginas]
+"""
+import datetime
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+import notion_api  # noqa: E402
+from ingest import project_pages  # noqa: E402
+from synthetic import generate_pages  # noqa: E402
+
+SECRETS = {"NOTION_TOKEN": "bench", "DATABASE_ID": "bench", "SENHA_ACESSO": "bench", "NOTION_STORE_PATH": "", "SNAPSHOT_PATH": ""}
+
+
+def patch_client(rows):
+    # O cliente devolve as linhas sintéticas sem tocar a rede
+    notion_api.NotionClient.probe = lambda self: "bench"
+    notion_api.NotionClient.sync = lambda self, known_version=None: (None if known_version == "bench" else rows, "bench")
+    notion_api.NotionClient.fetch_partition = lambda self, mes=None, anos=(): [r for r in rows if r[5] == mes]
+
+
+def best_of(fn, repeat=5):
+    tempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - t0)
+    return min(tempos)
+
+
+def full_rerun(aba, key):
+    at = AppTest.from_file(str(ROOT / "app.py"), default_timeout=120)
+    for k, v in SECRETS.items():
+        at.secrets[k] = v
+    at.session_state["password_correct"] = True
+    at.run()
+    at.radio[0].set_value(aba).run()
+    opcoes = at.selectbox(key=key).options
+
+    def troca():
+        atual = at.selectbox(key=key).value
+        at.selectbox(key=key).set_value(next(o for o in opcoes if o != atual)).run()
+    return best_of(troca)
+
+
+def _run_fragment(nome, *args):
+    # Script mínimo do AppTest: só chama a função-fragmento com os dados já prontos
+    import app
+    getattr(app, nome)(*args)
+
+
+def fragment_rerun(nome, *args):
+    at = AppTest.from_function(_run_fragment, args=(nome, *args), default_timeout=120)
+    for k, v in SECRETS.items():
+        at.secrets[k] = v
+    at.run()
+    return best_of(at.run)
+
+
+def fragment_args(rows):
+    from analytics import build_cube, project_installments
+    from dataset import Snapshot
+    from ingest import process_rows
+    snapshot = Snapshot(process_rows(rows), "bench", datetime.datetime.now())
+    # O Raio-X mostra um ano por vez (o corrente por padrão)
+    ano = datetime.date.today().year
+    return {
+        "render_raiox_detalhe": (snapshot, build_cube(snapshot.index.year(snapshot.df, ano)), ano),
+        "render_projecao_detalhe": (project_installments(snapshot.df),),
+        "aba_metas": (),
+    }
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    rows = project_pages(list(generate_pages(n)))
+    patch_client(rows)
+    args = fragment_args(rows)
+    casos = [
+        ("Raio-X (sel_macro)", "🕵🏻‍♂️ Raio-X de custos", "sel_macro", "render_raiox_detalhe"),
+        ("Projeções (sel_mes_proj)", "🔮 Projeções", "sel_mes_proj", "render_projecao_detalhe"),
+        ("Metas (sel_mes_metas)", "🎯 Metas", "sel_mes_metas", "aba_metas"),
+    ]
+    print(f"{n} transações")
+    for nome, aba, key, fragmento in casos:
+        antes = full_rerun(aba, key)
+        depois = fragment_rerun(fragmento, *args[fragmento])
+        print(f"{nome:28s} script inteiro: {antes * 1000:7.1f} ms | fragmento: {depois * 1000:7.1f} ms")
@@ -0,0 +1,179 @@
+"""Suíte de benchmarks: ingestão + preparo de dados de cada aba, sobre lançamentos sintéticos.
+
+Cada etapa é cronometrada (melhor de N) para cada tamanho pedido e o resultado é
+anexado a benchmarks/results.jsonl junto com o commit atual. A cada execução os tempos
+são comparados com a última medição do mesmo tamanho/etapa, e o que ficou mais lento
+que o limite é marcado como regressão. O results.jsonl fica fora do git: tempos só
+são comparáveis na mesma máquina (grave uma linha de base local antes de mexer).
+
+Uso: python benchmarks/bench_suite.py [tamanhos...] [--repeat 3] [--threshold 0.2] [--no-record] [--strict]
+     ex.: python benchmarks/bench_suite.py 1000 100000 1000000
+"""
+import argparse
+import datetime
+import itertools
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from analytics import (budget, build_cube, cash_flow, expenses_by_bank, investment_goal, monthly,  # noqa: E402
+                       payee_ranking, project_installments, real_expenses)
+from formatting import formata_br_array  # noqa: E402
+from ingest import MONTHS_ORDER, PeriodIndex, process_data  # noqa: E402
+from ledger import Ledger  # noqa: E402
+from synthetic import generate_pages  # noqa: E402
+
+RESULTS = ROOT / "benchmarks" / "results.jsonl"
+
+
+# --- Preparo de dados de cada aba: as funções de analytics que cada render_* chama ---
+# Como no app, meses e anos são fatias do índice de períodos montado junto com o dataset
+def prep_saude(df, index, mes, ano):
+    df_mes = index.month(df, mes, ano)
+    gastos = df_mes[df_mes['is_real_expense']]
+    auditoria = gastos[['Data', 'Transação', 'Valor', 'Tipo']].sort_values('Data')
+    auditoria = auditoria.assign(Data=auditoria['Data'].dt.strftime('%d/%m/%Y'), Valor=formata_br_array(auditoria['Valor']))
+    return cash_flow(df_mes), expenses_by_bank(gastos), auditoria
+
+
+def prep_historico(df, cube):
+    anual = monthly(cube, 'Valor')
+    entradas = df[(df['Valor'] > 0) & ~df['is_card_payment']].groupby(['Tipo', 'Descrição'], observed=True)['Valor'].sum()
+    saidas = df[(df['Valor'] < 0) & ~df['is_card_payment']].assign(Valor_Abs=lambda d: d['Valor'].abs())
+    return anual, entradas, saidas.groupby(['Macro_Grupo', 'Tipo'], observed=True)['Valor_Abs'].sum()
+
+
+def prep_raiox(df, cube):
+    gastos = df[df['is_real_expense']].assign(Valor_Abs=lambda d: d['Valor'].abs())
+    evolucao = monthly(real_expenses(cube), 'Saidas', by=['Macro_Grupo'])
+    macro = sorted(real_expenses(cube)['Macro_Grupo'].unique())[0]
+    detalhe = gastos[gastos['Macro_Grupo'] == macro].groupby(['Macro_Grupo', 'Tipo', 'Transação'], observed=True)['Valor_Abs'].sum()
+    return evolucao, detalhe, payee_ranking(gastos, exclude=["Usuario"])
+
+
+def prep_projecoes(df):
+    proj = project_installments(df)
+    if proj.empty:
+        return proj
+    linha = proj.groupby(['Periodo', 'Mes'])['Valor'].sum()
+    detalhe = proj[proj['Mes'] == proj['Mes'].iloc[0]].sort_values('Valor', ascending=False)
+    return linha, detalhe.assign(Valor=formata_br_array(detalhe['Valor']))
+
+
+def prep_metas(df, index, mes, ano):
+    cube_mes = build_cube(index.month(df, mes, ano))
+    metas = {"Despesas essenciais": 3000.0, "Gastos não essenciais": 1500.0, "Impostos e taxas": 500.0}
+    return investment_goal(cube_mes, 1000.0), budget(cube_mes, metas)
+
+
+def prep_patrimonio(ledger, ano, ajuste):
+    # Posição sobre o razão já sincronizado (get_ledger no app); o saldo de abertura muda a
+    # cada chamada para medir o cálculo, não a posição guardada até o próximo sync
+    abertura = {'Renda fixa': (ano * 12, 10_000.0 + ajuste), 'Moradia': (ano * 12, 250_000.0), 'Imóveis': (ano * 12, 80_000.0)}
+    return ledger.position(ano, abertura)
+
+
+def best_of(fn, repeat):
+    tempos = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - t0)
+    return min(tempos)
+
+
+def run(n, repeat):
+    """Tempos (s) de cada etapa para `n` páginas sintéticas."""
+    hoje = datetime.date.today()
+    mes, ano = MONTHS_ORDER[hoje.month - 1], hoje.year
+    pages = list(generate_pages(n, year=ano))
+    df = process_data(pages)
+    index = PeriodIndex(df)
+    # Histórico e Raio-X trabalham sobre o ano escolhido e o cubo dele (get_year no app)
+    df_ano = index.year(df, ano)
+    cube = build_cube(df_ano)
+    ledger, ajustes = Ledger().sync(df), itertools.count()
+    etapas = {
+        "ingest": lambda: process_data(pages),
+        "cube": lambda: build_cube(index.year(df, ano)),
+        "saude": lambda: prep_saude(df, index, mes, ano),
+        "historico": lambda: prep_historico(df_ano, cube),
+        "raiox": lambda: prep_raiox(df_ano, cube),
+        "projecoes": lambda: prep_projecoes(df),
+        "metas": lambda: prep_metas(df, index, mes, ano),
+        # Razão montado do zero (o pior caso; no app ele é incremental entre versões)
+        "ledger": lambda: Ledger().sync(df),
+        "patrimonio": lambda: prep_patrimonio(ledger, ano, next(ajustes)),
+    }
+    return {etapa: best_of(fn, repeat) for etapa, fn in etapas.items()}
+
+
+def git_commit():
+    """Commit atual (com sufixo -dirty se há alterações não commitadas nos .py)."""
+    git = lambda *args: subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    try:
+        commit = git("rev-parse", "--short", "HEAD")
+        return commit + "-dirty" if git("status", "--porcelain", "--", "*.py") else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_results(path=RESULTS):
+    """Última medição registrada de cada (n, etapa)."""
+    anteriores = {}
+    if path.exists():
+        for linha in path.read_text(encoding="utf-8").splitlines():
+            if linha.strip():
+                r = json.loads(linha)
+                anteriores[(r["n"], r["stage"])] = r
+    return anteriores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sizes", nargs="*", type=int, default=[1_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.2, help="piora relativa que conta como regressão")
+    parser.add_argument("--no-record", action="store_true", help="não anexa os tempos a results.jsonl")
+    parser.add_argument("--strict", action="store_true", help="sai com código 1 se houver regressão")
+    args = parser.parse_args()
+
+    anteriores = previous_results()
+    base = {"date": datetime.datetime.now().isoformat(timespec="seconds"), "commit": git_commit(),
+            "python": platform.python_version(), "pandas": pd.__version__}
+    registros, regressoes = [], 0
+    for n in args.sizes:
+        print(f"\n{n} transações")
+        for etapa, segundos in run(n, args.repeat).items():
+            anterior = anteriores.get((n, etapa))
+            comparacao = ""
+            if anterior:
+                razao = segundos / anterior["seconds"]
+                comparacao = f"  {razao:5.2f}x vs {anterior['commit']}"
+                if razao > 1 + args.threshold:
+                    comparacao += "  ⚠️ regressão"
+                    regressoes += 1
+            print(f"  {etapa:12s} {segundos * 1000:10.1f} ms{comparacao}")
+            registros.append({**base, "n": n, "stage": etapa, "seconds": round(segundos, 6)})
+
+    if not args.no_record:
+        with RESULTS.open("a", encoding="utf-8") as f:
+            for r in registros:
+                f.write(json.dumps(r) + "\n")
+    if regressoes:
+        print(f"\n{regressoes} etapa(s) mais lentas que o limite de {args.threshold:.0%}")
+        if args.strict:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Gerador de lançamentos sintéticos no formato das páginas do Notion.
+
+Produz o mesmo JSON que `databases/{id}/query` devolve, com as categorias reais de
+MACRO_CATEGORY_MAP, bancos, favorecidos, pagamentos de fatura e compras parceladas
+(uma página por parcela, como no Notion). Serve para medir desempenho sem a base real.
+
+Uso: python benchmarks/synthetic.py N [arquivo.jsonl]   (uma página por linha)
+"""
+import datetime
+import json
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from ingest import MACRO_CATEGORY_MAP, MONTHS_ORDER  # noqa: E402
+
+BANCOS = ["Nubank", "Itaú", "Inter", "C6", "Bradesco"]
+CARTOES = ["Nubank", "Itaú", "C6"]
+
+# Favorecidos típicos por Tipo; Tipos fora daqui usam FAVORECIDOS_GERAIS
+FAVORECIDOS = {
+    "Supermercado": ["Carrefour", "Pão de Açúcar", "Assaí Atacadista", "Mercado Central", "Hortifruti"],
+    "Transporte": ["Posto Shell", "Posto Ipiranga", "Uber", "99", "Sem Parar"],
+    "Bares / Restaurantes / Delivery": ["iFood", "Rappi", "Outback", "Padaria Real", "Boteco do Zé"],
+    "Moradia": ["Caixa Econômica", "Condomínio Ed. Aurora"],
+    "Contas residenciais": ["Enel", "Sabesp", "Comgás"],
+    "TV / Internet / Telefone": ["Vivo", "Claro", "Netflix", "Spotify"],
+    "Medicamentos": ["Drogasil", "Droga Raia", "Pague Menos"],
+    "Pets": ["Petz", "Cobasi", "Clínica Vet Amigo"],
+    "Vestuário": ["Renner", "C&A", "Zara", "Riachuelo"],
+    "Eletrônicos": ["Amazon", "Magazine Luiza", "Kabum"],
+    "Móveis e eletrodomésticos": ["Tok&Stok", "Casas Bahia", "Leroy Merlin"],
+    "Viagens": ["Latam", "Gol", "Booking.com", "Airbnb"],
+    "Imóveis": ["Construtora Horizonte"],
+}
+FAVORECIDOS_GERAIS = ["Mercado Livre", "Shopee", "Loja do Bairro", "Pix avulso"]
+
+RENDAS = {"Remuneração": ["Salário", "Férias", "13º"], "Adicional": ["Freela", "Bônus"],
+          "Rendimento": ["Rendimento CDB", "Rendimento Tesouro"], "Cashback": ["Cashback cartão"]}
+GASTOS = [t for t, macro in MACRO_CATEGORY_MAP.items() if macro not in ("Rendas", "Investimentos")]
+PARCELAVEIS = ["Eletrônicos", "Móveis e eletrodomésticos", "Vestuário", "Viagens", "Educação", "Reforma"]
+
+# Faixa de valor (R$) por Tipo; o resto usa FAIXA_PADRAO
+FAIXAS = {"Moradia": (1500, 4000), "Imóveis": (800, 2500), "Supermercado": (40, 900), "Viagens": (300, 6000),
+          "Eletrônicos": (200, 8000), "Móveis e eletrodomésticos": (300, 7000), "Reforma": (200, 9000)}
+FAIXA_PADRAO = (15, 600)
+
+
+def _rich(texto):
+    return {"type": "rich_text", "rich_text": [{"type": "text", "plain_text": texto}] if texto else []}
+
+
+def _page(i, data, mes_pagamento, banco, titulo, valor, tipo, favorecido="", descricao="", parcela=""):
+    editado = f"{data:%Y-%m-%d}T12:00:00.000Z"
+    return {"object": "page", "id": f"page-{i:08d}", "last_edited_time": editado, "archived": False, "properties": {
+        "Data": {"type": "formula", "formula": {"type": "string", "string": f"{data:%d/%m/%Y}"}},
+        "Banco": {"type": "select", "select": {"name": banco}},
+        "Transação": {"type": "title", "title": [{"type": "text", "plain_text": titulo}]},
+        # No Notion gasto é positivo e receita negativa; a ingestão inverte o sinal
+        "Valor": {"type": "number", "number": valor},
+        "Tipo de despesa": {"type": "select", "select": {"name": tipo}},
+        "Mês de pagamento": {"type": "select", "select": {"name": MONTHS_ORDER[mes_pagamento.month - 1]}},
+        "Favorecido": _rich(favorecido),
+        "Descrição": _rich(descricao),
+        "Parcela": _rich(parcela),
+    }}
+
+
+def _mais_meses(data, n):
+    ano, mes = divmod(data.year * 12 + data.month - 1 + n, 12)
+    return datetime.date(ano, mes + 1, 1)
+
+
+def generate_pages(n, seed=42, year=None, months=24):
+    """Gera `n` páginas (lazy) espalhadas pelos `months` meses que terminam em dezembro de `year`.
+
+    Cada sorteio vira receita (5%), investimento (3%), pagamento de fatura (3%), compra
+    parcelada (3%, uma página por parcela) ou gasto à vista (o resto).
+    """
+    rng = random.Random(seed)
+    year = year or datetime.date.today().year
+    inicio = datetime.date(year, 12, 1)
+    inicio = _mais_meses(inicio, -(months - 1))
+    dia = lambda mes: mes.replace(day=rng.randint(1, 28))
+    i = 0
+    while i < n:
+        mes = _mais_meses(inicio, rng.randrange(months))
+        data = dia(mes)
+        sorteio = rng.random()
+        if sorteio < 0.05:
+            tipo = rng.choice(list(RENDAS))
+            valor = -round(rng.uniform(3000, 12000) if tipo == "Remuneração" else rng.uniform(5, 800), 2)
+            yield _page(i, data, mes, rng.choice(BANCOS), tipo, valor, tipo, "", rng.choice(RENDAS[tipo]))
+        elif sorteio < 0.08:
+            tipo = "Renda fixa"
+            # Aporte (positivo no Notion) na maioria das vezes, resgate às vezes
+            valor = round(rng.uniform(200, 5000), 2) * (1 if rng.random() < 0.8 else -1)
+            yield _page(i, data, mes, rng.choice(BANCOS), "Aplicação CDB" if valor > 0 else "Resgate CDB", valor, tipo)
+        elif sorteio < 0.11:
+            cartao = rng.choice(CARTOES)
+            yield _page(i, data, mes, "Itaú", f"Fatura {cartao}", round(rng.uniform(800, 6000), 2),
+                        "Pagamento de cartão", f"Cartão {cartao}")
+        elif sorteio < 0.14:
+            # Compra parcelada: uma página por parcela em meses consecutivos, mesmo título/valor;
+            # a Data de cada página é a do mês da parcela, paga na fatura seguinte
+            tipo = rng.choice(PARCELAVEIS)
+            total = rng.choice([2, 3, 4, 5, 6, 10, 12])
+            favorecido = rng.choice(FAVORECIDOS.get(tipo, FAVORECIDOS_GERAIS))
+            parcela = round(rng.uniform(*FAIXAS.get(tipo, FAIXA_PADRAO)) / total, 2)
+            banco = rng.choice(CARTOES)
+            for k in range(1, min(total, n - i) + 1):
+                pagamento = _mais_meses(mes, k)
+                yield _page(i, _mais_meses(mes, k - 1).replace(day=data.day), pagamento, banco, f"{favorecido} {tipo.lower()}", parcela, tipo,
+                            favorecido, "", f"{k}/{total}")
+                i += 1
+            continue
+        else:
+            tipo = rng.choice(GASTOS)
+            favorecido = rng.choice(FAVORECIDOS.get(tipo, FAVORECIDOS_GERAIS)) if rng.random() < 0.85 else ""
+            banco = rng.choice(BANCOS)
+            # Compras no cartão entram na fatura do mês seguinte
+            pagamento = _mais_meses(mes, 1) if banco in CARTOES and rng.random() < 0.5 else mes
+            yield _page(i, data, pagamento, banco, favorecido or tipo, round(rng.uniform(*FAIXAS.get(tipo, FAIXA_PADRAO)), 2),
+                        tipo, favorecido, rng.choice(["", "", "Reembolso", "Presente"]))
+        i += 1
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    destino = open(sys.argv[2], "w", encoding="utf-8") if len(sys.argv) > 2 else sys.stdout
+    with destino:
+        for page in generate_pages(n):
+            destino.write(json.dumps(page, ensure_ascii=False) + "\n")
@@ -0,0 +1,139 @@
+import contextvars
+import datetime
+import threading
+import time
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from ingest import PeriodIndex
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Versão imutável do dataset processado; é trocada inteira, nunca alterada.
+
+    O índice de períodos é montado junto com o snapshot (na carga), fora dos reruns.
+    """
+    df: pd.DataFrame
+    version: str
+    loaded_at: datetime.datetime
+    index: PeriodIndex = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "index", PeriodIndex(self.df))
+
+
+class BackgroundRefresher:
+    """Stale-while-revalidate: serve o último dataset bom e revalida em uma thread.
+
+    `probe()` devolve uma sonda barata da fonte; `load(version)` sincroniza e devolve
+    (versão do conteúdo, DataFrame), com DataFrame None se o conteúdo ainda é `version`
+    (a do snapshot atual). Só há troca quando o conteúdo muda. Com a sonda igual, `load`
+    ainda roda a cada `max_idle` segundos, para o que a sonda não enxerga (remoções,
+    edições no mesmo minuto). Uma falha na revalidação só fica registrada em
+    `last_error`: o snapshot anterior continua sendo servido.
+
+    Uma instância é compartilhada por todas as sessões do processo (single-flight):
+    só uma revalidação roda por vez; quem chega durante a primeira carga espera por
+    ela e, depois disso, todo mundo recebe a versão anterior até a troca.
+
+    `initial` é um snapshot já pronto (ex.: lido do disco) servido desde a primeira
+    chamada; a primeira revalidação começa em seguida. `on_refresh(snapshot)` é chamado
+    a cada versão nova carregada. Sem `probe` o refresher fica offline: serve só `initial`.
+    """
+
+    def __init__(self, probe, load, max_age=60, max_idle=3600, initial=None, on_refresh=None):
+        self.probe = probe
+        self.load = load
+        self.max_age = max_age
+        self.max_idle = max_idle
+        self.on_refresh = on_refresh
+        self.current = initial
+        self.checked_at = 0.0
+        self.probed = None
+        self.synced_at = None
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._flight = threading.Lock()
+        self._worker = None
+        self.counters = {"hits": 0, "waits": 0, "probes": 0, "syncs": 0, "refreshes": 0, "errors": 0}
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def _refresh(self):
+        # Sempre chamado com self._flight adquirido
+        try:
+            self._count("probes")
+            sonda = self.probe()
+            atual = self.current
+            ocioso = self.synced_at is None or time.monotonic() - self.synced_at >= self.max_idle
+            if atual is None or sonda != self.probed or ocioso:
+                self._count("syncs")
+                version, df = self.load(atual.version if atual is not None else None)
+                self.probed, self.synced_at = sonda, time.monotonic()
+                if df is not None:
+                    # Troca atômica: quem já pegou o snapshot anterior continua com ele
+                    self.current = Snapshot(df, version, datetime.datetime.now())
+                    self._count("refreshes")
+                    if self.on_refresh is not None:
+                        self.on_refresh(self.current)
+            self.last_error = None
+        except Exception as exc:
+            self.last_error = exc
+            self._count("errors")
+        finally:
+            self.checked_at = time.monotonic()
+
+    def _revalidate(self):
+        with self._flight:
+            self._refresh()
+
+    def _start_background(self):
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            # No contexto de quem disparou: a revalidação entra no profiler se a execução dele estiver gravando
+            self._worker = threading.Thread(target=contextvars.copy_context().run, args=(self._revalidate,),
+                                            name="dataset-refresh", daemon=True)
+            self._worker.start()
+
+    def get(self):
+        """Snapshot para renderizar agora; só bloqueia se ainda não existe nenhum."""
+        if self.offline:
+            if self.current is None:
+                raise RuntimeError("Modo offline sem snapshot salvo")
+            self._count("hits")
+            return self.current
+        if self.current is None:
+            if not self._flight.acquire(blocking=False):
+                # Outra sessão já está carregando: espera por ela em vez de buscar de novo
+                self._count("waits")
+                self._flight.acquire()
+            try:
+                if self.current is None:
+                    self._refresh()
+            finally:
+                self._flight.release()
+            if self.current is None:
+                raise self.last_error
+            return self.current
+
+        self._count("hits")
+        if time.monotonic() - self.checked_at >= self.max_age:
+            self._start_background()
+        return self.current
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters)
+
+    @property
+    def offline(self):
+        return self.probe is None
+
+    @property
+    def refreshing(self):
+        return self._worker is not None and self._worker.is_alive()
@@ -0,0 +1,66 @@
+import functools
+
+import numpy as np
+import pandas as pd
+
+
+def formata_br(valor):
+    """1234.5 -> '1.234,50'. Memoizado: os mesmos valores se repetem em métricas e tabelas."""
+    # 0.0 e -0.0 são iguais como chave do cache: o zero negativo vira 0.0 antes da consulta,
+    # senão o sinal do primeiro zero formatado valeria para o processo inteiro
+    return _formata_br(valor + 0.0)
+
+
+@functools.lru_cache(maxsize=4096)
+def _formata_br(valor):
+    return f"{valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+# Acima disso os centavos não cabem com folga em int64 e o float já perdeu os centavos
+_MAX_EXATO = 1e13
+
+
+def _formata_vetor(v):
+    """Formata um array float64 de uma vez, em aritmética inteira de centavos."""
+    if not len(v):
+        return np.empty(0, dtype=object)
+    absoluto = np.abs(v)
+    escalado = absoluto * 100
+    # Empates de meio centavo (e o que não é finito/é enorme) ficam com o formatador do Python,
+    # que arredonda pelo valor binário exato; o resto é arredondado aqui mesmo
+    with np.errstate(invalid="ignore"):
+        empate = np.abs(escalado - np.floor(escalado) - 0.5) < 1e-6
+    lento = ~np.isfinite(v) | (absoluto >= _MAX_EXATO) | empate
+    centavos = np.rint(np.where(lento, 0, escalado)).astype(np.int64)
+    inteiro, fracao = np.divmod(centavos, 100)
+
+    # Monta a parte inteira de trás para frente, um grupo de 3 dígitos por passo
+    resto = inteiro // 1000
+    texto = np.where(resto > 0, np.char.zfill((inteiro % 1000).astype(str), 3), (inteiro % 1000).astype(str))
+    while (resto > 0).any():
+        grupo, proximo = resto % 1000, resto // 1000
+        grupo = np.where(proximo > 0, np.char.zfill(grupo.astype(str), 3), grupo.astype(str))
+        texto = np.where(resto > 0, np.char.add(np.char.add(grupo, "."), texto), texto)
+        resto = proximo
+
+    texto = np.char.add(np.char.add(texto, ","), np.char.zfill(fracao.astype(str), 2))
+    # signbit como o f-string: -0.001 vira '-0,00' (o -0.0 já chega normalizado)
+    texto = np.where(np.signbit(v), np.char.add("-", texto), texto).astype(object)
+    for i in np.flatnonzero(lento):
+        texto[i] = formata_br(float(v[i]))
+    return texto
+
+
+def formata_br_array(valores):
+    """Versão vetorizada de formata_br para uma Series/array numérico inteiro.
+
+    Valores repetidos (o caso comum em tabelas de lançamentos) são formatados uma vez só.
+    Uma Series volta como Series de texto com o mesmo índice; o resto, como array de objetos.
+    """
+    # Como em formata_br: sem o -0.0, que o factorize juntaria com 0.0
+    v = np.asarray(valores, dtype="float64") + 0.0
+    codigos, unicos = pd.factorize(v, use_na_sentinel=False)
+    texto = _formata_vetor(unicos)[codigos] if len(unicos) < len(v) else _formata_vetor(v)
+    if isinstance(valores, pd.Series):
+        return pd.Series(texto, index=valores.index, name=valores.name, dtype="str")
+    return texto
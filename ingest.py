@@ -0,0 +1,351 @@
+import linecache
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+
+# --- CONSTANTES ---
+MONTHS_ORDER = [
+    'Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+    'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro'
+]
+
+MACRO_CATEGORY_MAP = {
+    "Remuneração": "Rendas", "Cashback": "Rendas", "Rendimento": "Rendas", "Adicional": "Rendas",
+    "Moradia": "Despesas essenciais", "Contas residenciais": "Despesas essenciais",
+    "Supermercado": "Despesas essenciais", "Transporte": "Despesas essenciais",
+    "TV / Internet / Telefone": "Despesas essenciais", "Pets": "Despesas essenciais",
+    "Filhos": "Despesas essenciais", "Medicamentos": "Despesas essenciais",
+    "Plano de saúde": "Despesas essenciais", "Nutrição e atividade física": "Despesas essenciais",
+    "Cuidados médicos ou psicológicos": "Despesas essenciais", "Trabalho": "Despesas essenciais",
+    "Educação": "Despesas essenciais", "Previdência": "Despesas essenciais",
+    "Reforma": "Gastos não essenciais", "Bares / Restaurantes / Delivery": "Gastos não essenciais",
+    "Móveis e eletrodomésticos": "Gastos não essenciais", "Decoração e jardinagem": "Gastos não essenciais",
+    "Eletrônicos": "Gastos não essenciais", "Vestuário": "Gastos não essenciais",
+    "Estética": "Gastos não essenciais", "Lazer": "Gastos não essenciais",
+    "Presentes": "Gastos não essenciais", "Doações": "Gastos não essenciais",
+    "Viagens": "Gastos não essenciais", "Imóveis": "Investimentos", "Renda fixa": "Investimentos",
+    "Imposto de renda": "Impostos e taxas", "Impostos municipais": "Impostos e taxas",
+    "Taxas bancárias": "Impostos e taxas"
+}
+
+DATE_FORMAT = "%d/%m/%Y"
+
+# --- SCHEMA DE INGESTÃO ---
+# (propriedade no Notion, tipo da propriedade, coluna de saída)
+SCHEMA = (
+    ("Data", "formula", "Data"),
+    ("Banco", "select", "Banco"),
+    ("Transação", "title", "Transação"),
+    ("Valor", "number", "Valor"),
+    ("Tipo de despesa", "select", "Tipo"),
+    ("Mês de pagamento", "select", "Mes_Pagamento"),
+    ("Favorecido", "rich_text", "Favorecido"),
+    ("Descrição", "rich_text", "Descrição"),
+    ("Parcela", "rich_text", "Parcela"),
+)
+
+# Colunas booleanas criadas por classify()
+FLAGS = ['is_card_payment', 'is_investment', 'is_real_expense', 'is_real_income']
+
+# Valor usado quando a propriedade não existe ou está vazia; os demais tipos ficam nulos
+MISSING = {"title": "Sem Título", "number": 0.0}
+# Sentinela antiga de vazio, ainda presente em linhas gravadas no store antes dos nulos
+LEGACY_MISSING = "N/A"
+
+# --- LAYOUT DO DATAFRAME ---
+# Texto repetitivo vira categoria (códigos inteiros + dicionário); o mês é ordenado pelo calendário
+MONTH_DTYPE = pd.CategoricalDtype(MONTHS_ORDER, ordered=True)
+MACRO_DTYPE = pd.CategoricalDtype([*dict.fromkeys(MACRO_CATEGORY_MAP.values()), 'Outros'])
+CATEGORICAL = ['Banco', 'Tipo', 'Favorecido', 'Parcela']
+MONTH_INDEX = {mes: i for i, mes in enumerate(MONTHS_ORDER)}
+
+
+# Erros de uma propriedade malformada: a célula fica com o valor padrão
+_MALFORMED = (KeyError, IndexError, TypeError, AttributeError)
+
+
+def _first(campo, chave):
+    """Extrator de propriedades de lista (title, rich_text, people): o primeiro item."""
+    def factory(prop, default):
+        def extract(p):
+            try:
+                itens = p[prop][campo]
+                valor = itens[0][chave] if itens else None
+            except _MALFORMED:
+                return default
+            return default if valor is None else valor
+        return extract
+    return factory
+
+
+def _select(prop, default):
+    def extract(p):
+        try:
+            opcao = p[prop]["select"]
+            valor = opcao["name"] if opcao else None
+        except _MALFORMED:
+            return default
+        return default if valor is None else valor
+    return extract
+
+
+def _formula(prop, default):
+    def extract(p):
+        try:
+            valor = p[prop]["formula"].get("string")
+        except _MALFORMED:
+            return default
+        return default if valor is None else valor
+    return extract
+
+
+def _number(prop, default):
+    def extract(p):
+        try:
+            valor = p[prop].get("number")
+        except _MALFORMED:
+            return default
+        return default if valor is None else valor
+    return extract
+
+
+# Tipo de propriedade -> fábrica de extrator tolerante (nome da propriedade, valor padrão) -> fn(properties).
+# É o caminho de uma página malformada, célula a célula.
+EXTRACTORS = {
+    "select": _select,
+    "people": _first("people", "name"),
+    "rich_text": _first("rich_text", "plain_text"),
+    "formula": _formula,
+    "title": _first("title", "plain_text"),
+    "number": _number,
+}
+
+# A mesma extração como expressão sobre a propriedade `v` (None vira o valor padrão), para o
+# laço gerado por compile_schema; tests/test_ingest.py confere que os dois caminhos concordam
+EXPRESSIONS = {
+    "select": 'v["select"]["name"] if v["select"] else None',
+    "people": 'v["people"][0]["name"] if v["people"] else None',
+    "rich_text": 'v["rich_text"][0]["plain_text"] if v["rich_text"] else None',
+    "formula": 'v["formula"].get("string")',
+    "title": 'v["title"][0]["plain_text"] if v["title"] else None',
+    "number": 'v.get("number")',
+}
+
+
+def compile_schema(schema=SCHEMA):
+    """Compila o schema em uma projeção de uma passada: lote de páginas -> uma tupla por página.
+
+    Cada célula é uma expressão inline no laço, sem chamada de função por célula (que custa
+    tanto quanto o antigo get_prop_safe). O código gerado fica em `project.source` e no
+    linecache, então aparece em tracebacks e no debugger. Uma página malformada é refeita
+    pelos extratores tolerantes de EXTRACTORS.
+    """
+    celulas = [(prop, p_type, MISSING.get(p_type)) for prop, p_type, _ in schema]
+    linhas = ["def project(pages):",
+              "    rows = []",
+              "    for page in pages:",
+              "        p = page['properties']",
+              "        try:"]
+    for i, (prop, p_type, _) in enumerate(celulas):
+        linhas.append(f"            v = p.get({prop!r}); x{i} = ({EXPRESSIONS[p_type]}) if v else None")
+    linhas += ["        except MALFORMED:",
+               "            rows.append(tuple([extract(p) for extract in tolerant]))",
+               "            continue",
+               f"        rows.append(({', '.join(f'd{i} if x{i} is None else x{i}' for i in range(len(celulas)))},))",
+               "    return rows"]
+    source = "\n".join(linhas) + "\n"
+
+    arquivo = f"<ingest.compile_schema {hash(tuple(schema)) & 0xffffffff:08x}>"
+    namespace = {"MALFORMED": _MALFORMED, **{f"d{i}": default for i, (_, _, default) in enumerate(celulas)},
+                 "tolerant": tuple(EXTRACTORS[p_type](prop, default) for prop, p_type, default in celulas)}
+    exec(compile(source, arquivo, "exec"), namespace)
+    linecache.cache[arquivo] = (len(source), None, source.splitlines(True), arquivo)
+    project = namespace["project"]
+    project.source = source
+    return project
+
+COLUMNS = [col for _, _, col in SCHEMA]
+PROPERTIES = [prop for prop, _, _ in SCHEMA]
+project_pages = compile_schema()
+
+
+def extract_pages(pages):
+    """Lote de páginas -> {coluna: lista de valores}."""
+    return extract_columns(project_pages(pages))
+
+
+def extract_columns(rows, columns=COLUMNS):
+    """Transpõe as tuplas projetadas em uma lista por coluna."""
+    transposta = list(zip(*rows))
+    return {col: list(valores) for col, valores in zip(columns, transposta or [()] * len(columns))}
+
+
+def parse_dates(values):
+    """Datas do Notion no formato fixo dd/mm/aaaa, cada data distinta convertida uma vez."""
+    codigos, unicas = pd.factorize(values)
+    datas = _parse_dates(pd.Series(unicas, dtype=object)).to_numpy()
+    # -1 (nulo) indexa o último elemento, que é NaT
+    return pd.Series(np.append(datas, np.array('NaT', dtype=datas.dtype))[codigos], index=values.index)
+
+
+def _parse_dates(values):
+    """O que escapar do formato fixo cai na inferência."""
+    datas = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+    vazias = datas.isna()
+    if vazias.any():
+        fora_do_formato = vazias & values.notna() & (values != LEGACY_MISSING)
+        if fora_do_formato.any():
+            datas[fora_do_formato] = pd.to_datetime(values[fora_do_formato], dayfirst=True, errors='coerce')
+    return datas
+
+
+def process_data(results):
+    """Páginas cruas do Notion -> DataFrame tipado."""
+    return process_columns(extract_pages(results))
+
+
+def process_rows(rows):
+    """Tuplas já projetadas (ver project_pages) -> DataFrame tipado."""
+    return process_columns(extract_columns(rows))
+
+
+def process_columns(colunas):
+    """{coluna: lista de valores} -> DataFrame tipado, com chave de favorecido, períodos e flags."""
+    df = typed_frame(colunas)
+    df['Favorecido_Chave'] = payee_keys(df['Favorecido'])
+    df = add_periods(df)
+    return classify(df)
+
+
+def typed_frame(colunas):
+    """{coluna: lista de valores} -> DataFrame com as colunas do schema tipadas e o Macro_Grupo."""
+    # Colunas já saem tipadas: nada de inferência de dtype/formato pelo pandas
+    colunas['Valor'] = 0.0 - np.asarray(colunas['Valor'], dtype='float64')
+    colunas['Data'] = parse_dates(pd.Series(colunas['Data']))
+    for col in CATEGORICAL:
+        colunas[col] = _categorical(colunas[col])
+    # Mês fora da lista (grafado diferente) fica nulo, como já acontecia no cubo
+    colunas['Mes_Pagamento'] = pd.Categorical(colunas['Mes_Pagamento'], dtype=MONTH_DTYPE)
+    colunas['Descrição'] = pd.Series(colunas['Descrição']).replace(LEGACY_MISSING, None)
+    df = pd.DataFrame(colunas)
+    # O map roda uma vez por categoria de Tipo; Tipo fora do mapa (ou nulo) cai em 'Outros'
+    df['Macro_Grupo'] = df['Tipo'].map(MACRO_CATEGORY_MAP).astype(MACRO_DTYPE).fillna('Outros')
+    return df
+
+
+def payment_period(df, today=None):
+    """Período de pagamento como inteiro (ano * 12 + mês - 1).
+
+    O Notion só guarda o nome do mês de pagamento; o ano vem da Data da transação,
+    escolhendo o ano que deixa o pagamento a no máximo 6 meses da data
+    (compra em dezembro paga em janeiro cai no ano seguinte).
+    """
+    today = today or pd.Timestamp.today()
+    # O código do categórico ordenado já é o índice do mês (-1 para nulo)
+    codigos = df['Mes_Pagamento'].cat.codes
+    mes = codigos.astype('float64').where(codigos >= 0)
+    mes_data = (df['Data'].dt.month - 1).fillna(mes)
+    ano = df['Data'].dt.year.fillna(today.year)
+    ano = ano + (mes_data - mes > 6) - (mes - mes_data > 6)
+    return (ano * 12 + mes).astype('Int64')
+
+
+def add_periods(df, today=None):
+    """Dimensão de tempo: Periodo (ano * 12 + mês, nulo sem mês de pagamento) e Ano.
+
+    Sem mês de pagamento o Ano vem da Data (ou do ano corrente). O frame sai ordenado
+    por Ano/Periodo, então cada ano e cada mês é uma fatia contígua (ver PeriodIndex).
+    """
+    today = today or pd.Timestamp.today()
+    periodo = payment_period(df, today)
+    ano = (periodo // 12).astype('float64').fillna(df['Data'].dt.year).fillna(today.year).astype('int64')
+    df = df.assign(Periodo=periodo, Ano=ano)
+    return df.sort_values(['Ano', 'Periodo'], kind='stable', na_position='last', ignore_index=True)
+
+
+def _categorical(values):
+    categorias = pd.Categorical(values)
+    if LEGACY_MISSING in categorias.categories:
+        categorias = categorias.remove_categories(LEGACY_MISSING)
+    return categorias
+
+
+def payee_key(nome):
+    """Chave de comparação de um favorecido: sem acentos, em minúsculas e com espaços simples."""
+    sem_acento = "".join(c for c in unicodedata.normalize("NFKD", nome) if not unicodedata.combining(c))
+    return " ".join(sem_acento.casefold().split())
+
+
+def payee_keys(favorecido):
+    """Dimensão de favorecidos: o categórico `favorecido` agrupado pela chave normalizada.
+
+    'Padaria São João' e ' padaria sao  joao' viram a mesma categoria. A chave é calculada
+    uma vez por categoria; nome vazio (ou só espaços) fica nulo.
+    """
+    chaves = np.array([payee_key(c) or None for c in favorecido.cat.categories], dtype=object)
+    codigos, unicas = pd.factorize(chaves, sort=True)
+    # -1 (nulo) indexa o último elemento, que é o próprio -1
+    return pd.Categorical.from_codes(np.append(codigos, -1)[favorecido.cat.codes.to_numpy()], categories=unicas)
+
+
+def classify(df):
+    """Flags de classificação calculadas uma única vez na ingestão; as abas só filtram por elas."""
+    # O texto é testado uma vez por categoria de Tipo, não uma vez por linha
+    # (sem nenhum Tipo preenchido as categorias saem float, então o texto é convertido antes)
+    tipos = df['Tipo'].cat.categories
+    df['is_card_payment'] = df['Tipo'].isin(tipos[tipos.astype(str).str.contains("Pagamento de cartão", case=False)])
+    df['is_investment'] = df['Macro_Grupo'] == "Investimentos"
+    operacional = ~(df['is_card_payment'] | df['is_investment'])
+    df['is_real_expense'] = operacional & (df['Valor'] < 0)
+    df['is_real_income'] = operacional & (df['Valor'] > 0)
+    return df
+
+
+class PeriodIndex:
+    """Faixas de linhas de cada ano e de cada ano-mês, sobre o frame ordenado da ingestão (ver add_periods).
+
+    Como o frame vem ordenado por Ano/Periodo, cada ano e cada mês é uma faixa contígua
+    [início, fim): fatiar é O(1) e devolve uma view, sem varrer nem copiar o frame.
+    """
+
+    def __init__(self, df):
+        periodo = df['Periodo'].fillna(-1).to_numpy(dtype='int64')
+        ano = df['Ano'].to_numpy(dtype='int64')
+        mudou = np.flatnonzero((np.diff(periodo) != 0) | (np.diff(ano) != 0)) + 1
+        inicios, fins = np.r_[0, mudou], np.r_[mudou, len(df)]
+        self.periods, self._years = {}, {}
+        for inicio, fim in zip(inicios.tolist(), fins.tolist()):
+            if inicio == fim:
+                continue
+            if periodo[inicio] >= 0:
+                self.periods[int(periodo[inicio])] = (inicio, fim)
+            a = int(ano[inicio])
+            self._years[a] = (self._years.get(a, (inicio,))[0], fim)
+
+    @property
+    def years(self):
+        """Anos presentes, em ordem."""
+        return sorted(self._years)
+
+    def months(self, ano):
+        """Meses de `ano` com lançamentos, na ordem do calendário."""
+        return [MONTHS_ORDER[p % 12] for p in sorted(self.periods) if p // 12 == ano]
+
+    def year(self, df, ano):
+        inicio, fim = self._years.get(ano, (0, 0))
+        return df.iloc[inicio:fim]
+
+    def month(self, df, mes, ano):
+        inicio, fim = self.periods.get(ano * 12 + MONTH_INDEX[mes], (0, 0))
+        return df.iloc[inicio:fim]
+
+
+def memory_report(df):
+    """Memória (bytes, com o conteúdo dos textos) e dtype de cada coluna, da maior para a menor."""
+    uso = df.memory_usage(deep=True, index=False)
+    linhas = [{"coluna": col, "dtype": str(df[col].dtype), "bytes": int(uso[col]),
+               "categorias": len(df[col].cat.categories) if isinstance(df[col].dtype, pd.CategoricalDtype) else None}
+              for col in df.columns]
+    return pd.DataFrame(linhas).sort_values("bytes", ascending=False, ignore_index=True)
@@ -0,0 +1,206 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from ingest import MONTHS_ORDER
+
+
+# --- CONTAS ---
+# Tipo -> (conta, regra). A regra define o impacto de cada lançamento no saldo da conta:
+#   rendimento: sempre soma (|Valor|)
+#   aplicacao:  aporte (saída) soma e resgate (entrada) subtrai (-Valor)
+#   pagamento:  saída abate a dívida; entradas não mexem nela (min(Valor, 0))
+ACCOUNTS = {
+    "Rendimento": ("Renda fixa", "rendimento"),
+    "Renda fixa": ("Renda fixa", "aplicacao"),
+    "Moradia": ("Moradia", "pagamento"),
+    "Imóveis": ("Imóveis", "pagamento"),
+}
+# Contas com dívida (regra pagamento); as demais são ativos
+LIABILITY_RULES = {"pagamento"}
+
+# Colunas que identificam um lançamento para o sync incremental
+KEY_COLUMNS = ['Data', 'Transação', 'Valor', 'Tipo', 'Banco', 'Descrição', 'Parcela', 'Periodo']
+
+
+def signed_impact(df, accounts=ACCOUNTS):
+    """Conta e impacto com sinal de cada lançamento (conta nula e 0 fora de `accounts`)."""
+    # Os maps rodam uma vez por categoria de Tipo; o impacto sai de um único np.select
+    conta = df['Tipo'].map({tipo: c for tipo, (c, _) in accounts.items()})
+    regra = df['Tipo'].map({tipo: r for tipo, (_, r) in accounts.items()})
+    valor = df['Valor'].to_numpy()
+    impacto = np.select(
+        [(regra == "rendimento").to_numpy(), (regra == "aplicacao").to_numpy(), (regra == "pagamento").to_numpy()],
+        [np.abs(valor), -valor, np.minimum(valor, 0.0)],
+        0.0,
+    )
+    return conta, impacto
+
+
+def row_keys(df, columns=KEY_COLUMNS):
+    """Chave de 64 bits por lançamento; lançamentos idênticos recebem chaves distintas pela ordem."""
+    h = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    ocorrencia = pd.Series(h).groupby(h).cumcount().to_numpy().astype('uint64')
+    return h + ocorrencia * np.uint64(0x9E3779B97F4A7C15)
+
+
+def _accumulate(atual, linhas, coluna, sinal):
+    """Soma (sinal=1) ou subtrai (sinal=-1) `linhas` da série (Conta, coluna) -> Impacto."""
+    # A contagem de lançamentos acompanha a soma para descartar dias/períodos que ficaram vazios
+    novo = linhas.groupby(['Conta', coluna])['Impacto'].agg(['sum', 'size']) * sinal
+    if atual is not None:
+        novo = atual.add(novo, fill_value=0.0)
+    return novo[novo['size'] > 0]
+
+
+def _cumulative(impactos, coluna):
+    """Série (Conta, coluna, Impacto, Acumulado) ordenada, com o acumulado de cada conta."""
+    df = impactos['sum'].sort_index().rename('Impacto').reset_index()
+    df['Acumulado'] = df.groupby('Conta', observed=True)['Impacto'].cumsum()
+    return df
+
+
+def _accumulated_before(serie, coluna, conta, ref):
+    """Acumulado de `conta` antes de `ref` (0 se não houve lançamento antes)."""
+    da_conta = serie[serie['Conta'] == conta]
+    pos = np.searchsorted(da_conta[coluna].to_numpy(), ref)
+    return float(da_conta['Acumulado'].iloc[pos - 1]) if pos else 0.0
+
+
+def _running(serie, coluna, inicio, opening):
+    """Saldo corrente de cada conta a partir do saldo de abertura no início do período `inicio[conta]`.
+
+    Saldo(t) = abertura + impactos acumulados até t - impactos acumulados antes do início,
+    o que vale tanto para frente quanto para trás da data de abertura. `serie` vem de _cumulative.
+    """
+    antes = {conta: _accumulated_before(serie, coluna, conta, ref) for conta, ref in inicio.items()}
+    saldo = serie['Conta'].map(opening).fillna(0.0) + serie['Acumulado'] - serie['Conta'].map(antes).fillna(0.0)
+    return serie.drop(columns='Acumulado').assign(Saldo=saldo)
+
+
+class Ledger:
+    """Livro-razão das contas de ativo e passivo (ver ACCOUNTS), mantido de forma incremental.
+
+    Guarda o impacto de cada lançamento das contas somado por dia e por período, já com o
+    acumulado de cada conta. `sync(df)` aplica só a diferença para o frame anterior (novos
+    somam, removidos subtraem) e troca esse estado de uma vez; os saldos correntes saem do
+    acumulado para qualquer saldo de abertura, e cada posição fica guardada até o próximo sync.
+    Uma instância pode ser compartilhada entre sessões: sync é serializado por um lock.
+    """
+
+    def __init__(self, accounts=ACCOUNTS):
+        self.accounts = accounts
+        self.version = None
+        self.lines = pd.DataFrame({'Conta': pd.Series(dtype=object), 'Data': pd.Series(dtype='datetime64[us]'),
+                                   'Periodo': pd.Series(dtype='Int64'), 'Impacto': pd.Series(dtype='float64')},
+                                  index=pd.Index([], dtype='uint64'))
+        # (impactos por dia, por período, séries acumuladas por dia, por período, posições já calculadas)
+        self._state = (None, None, None, None, {})
+        self.counters = {"syncs": 0, "added": 0, "removed": 0}
+        self._lock = threading.Lock()
+
+    def _lines(self, df):
+        relevantes = df[df['Tipo'].isin(list(self.accounts))]
+        conta, impacto = signed_impact(relevantes, self.accounts)
+        return pd.DataFrame({'Conta': conta.astype(object).to_numpy(), 'Data': relevantes['Data'].to_numpy(),
+                             'Periodo': relevantes['Periodo'].to_numpy(), 'Impacto': impacto},
+                            index=pd.Index(row_keys(relevantes), dtype='uint64'))
+
+    def _apply(self, *mudancas):
+        """Aplica pares (linhas, sinal) e publica o novo estado em uma única atribuição."""
+        dia, mes = self._state[:2]
+        for linhas, sinal in mudancas:
+            if not linhas.empty:
+                dia = _accumulate(dia, linhas, 'Data', sinal)
+                mes = _accumulate(mes, linhas.dropna(subset=['Periodo']), 'Periodo', sinal)
+        if dia is not self._state[0] or mes is not self._state[1]:
+            self._state = (dia, mes, _cumulative(dia, 'Data'), _cumulative(mes, 'Periodo'), {})
+
+    def add(self, df):
+        """Soma lançamentos novos (ex.: só as páginas criadas desde a última carga)."""
+        with self._lock:
+            novas = self._lines(df)
+            self._apply((novas, 1))
+            self.lines = pd.concat([self.lines, novas])
+            self.counters["added"] += len(novas)
+        return self
+
+    def sync(self, df, version=None):
+        """Deixa o razão igual ao frame `df`, aplicando só as linhas que entraram ou saíram."""
+        with self._lock:
+            if version is not None and version == self.version:
+                return self
+            linhas = self._lines(df)
+            novas = linhas[~linhas.index.isin(self.lines.index)]
+            removidas = self.lines[~self.lines.index.isin(linhas.index)]
+            self._apply((novas, 1), (removidas, -1))
+            self.lines, self.version = linhas, version
+            self.counters["syncs"] += 1
+            self.counters["added"] += len(novas)
+            self.counters["removed"] += len(removidas)
+        return self
+
+    def monthly(self, opening, state=None):
+        """Impacto e saldo no fim de cada período (Conta, Periodo, Impacto, Saldo).
+
+        `opening` é {conta: (periodo, saldo no início do período)}; conta sem abertura começa em 0.
+        """
+        serie = (state or self._state)[3]
+        if serie is None:
+            return pd.DataFrame(columns=['Conta', 'Periodo', 'Impacto', 'Saldo'])
+        inicio = {conta: periodo for conta, (periodo, _) in opening.items()}
+        return _running(serie, 'Periodo', inicio, {c: s for c, (_, s) in opening.items()})
+
+    def daily(self, opening, state=None):
+        """Impacto e saldo no fim de cada dia com lançamento (Conta, Data, Impacto, Saldo)."""
+        serie = (state or self._state)[2]
+        if serie is None:
+            return pd.DataFrame(columns=['Conta', 'Data', 'Impacto', 'Saldo'])
+        inicio = {conta: pd.Timestamp(periodo // 12, periodo % 12 + 1, 1) for conta, (periodo, _) in opening.items()}
+        return _running(serie, 'Data', inicio, {c: s for c, (_, s) in opening.items()})
+
+    def balance_at(self, conta, periodo, opening, state=None):
+        """Saldo de `conta` no início de `periodo`."""
+        ref, saldo = opening.get(conta, (periodo, 0.0))
+        serie = (state or self._state)[3]
+        if serie is None:
+            return saldo
+        return saldo + _accumulated_before(serie, 'Periodo', conta, periodo) - _accumulated_before(serie, 'Periodo', conta, ref)
+
+    def position(self, ano, opening, until=None, daily=False):
+        """Posição de cada conta em `ano` (até o período `until`, se dado) e o patrimônio líquido.
+
+        Por conta: saldo de abertura em janeiro, movimento e saldo no fim, e a série mensal
+        (Mes_Pagamento, Impacto, Saldo) do ano; com `daily`, também a diária (Data, Impacto,
+        Saldo). O patrimônio usa o saldo de abertura das dívidas (o valor real do banco; as
+        parcelas incluem juros). O resultado fica guardado até o próximo sync: não o altere.
+        """
+        # Um único estado lido de uma vez: um sync concorrente não mistura versões
+        state = self._state
+        chave = (ano, until, daily, tuple(sorted(opening.items())))
+        posicoes = state[4]
+        if chave in posicoes:
+            return posicoes[chave]
+        fim = (ano + 1) * 12 if until is None else until + 1
+        mensal = self.monthly(opening, state)
+        mensal = mensal[(mensal['Periodo'] >= ano * 12) & (mensal['Periodo'] < fim)]
+        if daily:
+            diario = self.daily(opening, state)
+            diario = diario[(diario['Data'] >= pd.Timestamp(ano, 1, 1)) & (diario['Data'] < pd.Timestamp(fim // 12, fim % 12 + 1, 1))]
+        contas, patrimonio = {}, 0.0
+        for conta in dict.fromkeys(c for c, _ in self.accounts.values()):
+            regras = {r for c, r in self.accounts.values() if c == conta}
+            abertura = self.balance_at(conta, ano * 12, opening, state)
+            serie = mensal[mensal['Conta'] == conta].drop(columns='Conta')
+            movimento = float(serie['Impacto'].sum())
+            passivo = regras <= LIABILITY_RULES
+            contas[conta] = {
+                "passivo": passivo, "abertura": abertura, "movimento": movimento, "saldo": abertura + movimento,
+                "mensal": serie.assign(Mes_Pagamento=[MONTHS_ORDER[p % 12] for p in serie['Periodo']]),
+            }
+            if daily:
+                contas[conta]["diario"] = diario[diario['Conta'] == conta].drop(columns='Conta')
+            patrimonio += -abertura if passivo else abertura + movimento
+        posicoes[chave] = resultado = {"contas": contas, "patrimonio_liquido": patrimonio}
+        return resultado
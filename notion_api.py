@@ -0,0 +1,169 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote
+
+from ingest import MONTHS_ORDER, PROPERTIES, project_pages
+from notion_http import NotionError, NotionTransport
+from notion_store import content_version
+
+
+NOTION_API_URL = "https://api.notion.com/v1"
+NOTION_VERSION = "2022-06-28"
+# Páginas arquivadas/excluídas somem da query sem alterar o high-water mark,
+# então de tempos em tempos conferimos a lista completa de ids.
+RECONCILE_INTERVAL = 3600
+# Partições baixadas em paralelo; o token bucket do transporte continua valendo para todas
+MAX_WORKERS = 4
+
+
+def partition_filter(mes=None, anos=()):
+    """Filtro do Notion para uma partição: mês de pagamento e/ou anos da Data (dd/mm/aaaa)."""
+    clausulas = []
+    if mes:
+        clausulas.append({"property": "Mês de pagamento", "select": {"equals": mes}})
+    if anos:
+        clausulas.append({"or": [{"property": "Data", "formula": {"string": {"ends_with": f"/{ano}"}}} for ano in anos]})
+    if len(clausulas) > 1:
+        return {"and": clausulas}
+    return clausulas[0] if clausulas else None
+
+
+def month_partitions(months=MONTHS_ORDER):
+    """Divide o database em partições disjuntas por 'Mês de pagamento'.
+
+    A última partição pega tudo que não é um dos meses (vazio ou grafado diferente),
+    então a união das partições é sempre o database inteiro.
+    """
+    partes = [partition_filter(mes) for mes in months]
+    partes.append({"and": [{"property": "Mês de pagamento", "select": {"does_not_equal": mes}} for mes in months]})
+    return partes
+
+
+class NotionClient:
+    def __init__(self, token, db_id, store=None, reconcile_interval=RECONCILE_INTERVAL, api_url=NOTION_API_URL, transport=None, max_workers=MAX_WORKERS,
+                 properties=PROPERTIES, project=project_pages):
+        self.token = token
+        self.api_url = api_url
+        self.db_id = db_id
+        self.store = store
+        self.reconcile_interval = reconcile_interval
+        self.max_workers = max_workers
+        # Só as propriedades usadas pela ingestão trafegam, já projetadas em tuplas compactas
+        self.properties = properties
+        self.project = project
+        self._property_ids = None
+        self.headers = {"Authorization": f"Bearer {self.token}", "Notion-Version": NOTION_VERSION, "Content-Type": "application/json"}
+        self.transport = transport or NotionTransport(self.headers)
+
+    @property
+    def query_url(self):
+        return f"{self.api_url}/databases/{self.db_id}/query"
+
+    def iter_batches(self, body=None, params=None):
+        """Percorre a paginação por cursor de uma query, devolvendo as páginas de cada resposta."""
+        body, has_more, next_cursor = dict(body or {}), True, None
+        while has_more:
+            payload = {**body, "start_cursor": next_cursor} if next_cursor else body
+            data = self.transport.post(self.query_url, json=payload, params=params)
+            yield data.get("results", [])
+            has_more, next_cursor = data.get("has_more", False), data.get("next_cursor")
+
+    def iter_pages(self, body=None, params=None):
+        """Como iter_batches, página a página."""
+        for lote in self.iter_batches(body, params=params):
+            yield from lote
+
+    def projection_params(self):
+        """Parâmetro filter_properties com os ids das propriedades do schema de ingestão."""
+        if not self.properties:
+            return None
+        if self._property_ids is None:
+            try:
+                schema = self.transport.get(f"{self.api_url}/databases/{self.db_id}")["properties"]
+            except (NotionError, KeyError):
+                return None  # Sem o schema a query segue com todas as propriedades
+            # Os ids vêm url-encoded; o requests codifica de novo ao montar a query string
+            self._property_ids = [unquote(schema[nome]["id"]) for nome in self.properties if nome in schema]
+        return {"filter_properties": self._property_ids} if self._property_ids else None
+
+    def iter_records(self, body=None, params=None):
+        """Páginas projetadas à medida que chegam: (id, last_edited_time, arquivada, células).
+
+        A projeção é colunar sobre cada resposta da API (até 100 páginas), não página a página.
+        """
+        for lote in self.iter_batches(body, params=params):
+            for page, row in zip(lote, self.project(lote)):
+                yield page["id"], page["last_edited_time"], bool(page.get("archived") or page.get("in_trash")), row
+
+    def fetch_all_records(self):
+        if self.max_workers > 1:
+            return self.fetch_parallel(month_partitions())
+        return list(self.iter_records(params=self.projection_params()))
+
+    def fetch_parallel(self, partitions):
+        """Pagina cada partição em uma thread e junta o resultado, sem repetir ids."""
+        params = self.projection_params()
+
+        def baixa(filtro):
+            return list(self.iter_records({"filter": filtro}, params=params))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            resultados = list(pool.map(baixa, partitions))
+        records = {}
+        for parte in resultados:
+            for record in parte:
+                records.setdefault(record[0], record)
+        return list(records.values())
+
+    def fetch_partition(self, mes=None, anos=()):
+        """Só as páginas da partição pedida trafegam; o filtro roda no servidor do Notion."""
+        filtro = partition_filter(mes, anos)
+        records = self.iter_records({"filter": filtro} if filtro else None, params=self.projection_params())
+        return [row for _, _, arquivada, row in records if not arquivada]
+
+    def probe(self):
+        """Fingerprint barato do database, para saber se vale a pena sincronizar.
+
+        Uma query com page_size=1 ordenada por last_edited_time traz a edição mais
+        recente, mais a contagem de páginas do store. Remoções e uma segunda edição no
+        mesmo minuto não mudam a sonda: elas aparecem na sincronização periódica do
+        refresher (ver dataset.BackgroundRefresher), que também reconcilia a lista de ids.
+        """
+        body = {"page_size": 1, "sorts": [{"timestamp": "last_edited_time", "direction": "descending"}]}
+        results = self.transport.post(self.query_url, json=body, params={"filter_properties": "title"}).get("results", [])
+        partes = [results[0]["last_edited_time"], results[0]["id"]] if results else ["vazio"]
+        if self.store is not None:
+            partes.append(str(self.store.count()))
+        return "|".join(partes)
+
+    def fetch_page_ids(self):
+        # 'title' é o id fixo da propriedade de título: a resposta vem sem as demais colunas
+        return [page["id"] for page in self.iter_pages(params={"filter_properties": "title"})]
+
+    def sync(self, known_version=None):
+        """Sincronização incremental: busca só o que mudou desde o último high-water mark.
+
+        Devolve (linhas projetadas, versão do conteúdo); a versão muda só quando alguma
+        página é criada, editada ou removida. Se ela for igual a `known_version`, as
+        linhas não são lidas e voltam como None.
+        """
+        if self.store is None:
+            records = sorted((r for r in self.fetch_all_records() if not r[2]), key=lambda r: r[0])
+            version = content_version((page_id, json.dumps(row, ensure_ascii=False)) for page_id, _, _, row in records)
+            return (None if version == known_version else [row for _, _, _, row in records]), version
+
+        hwm = self.store.high_water_mark
+        if hwm is None or self.store.is_empty():
+            self.store.clear()
+            self.store.upsert(self.fetch_all_records())
+            self.store.mark_reconciled()
+        else:
+            # O Notion arredonda last_edited_time para o minuto: on_or_after reprocessa
+            # o minuto do high-water mark, e o upsert é idempotente.
+            filtro = {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": hwm}}
+            self.store.upsert(list(self.iter_records({"filter": filtro}, params=self.projection_params())))
+            if time.time() - self.store.last_reconcile >= self.reconcile_interval:
+                self.store.retain(self.fetch_page_ids())
+        version = self.store.version
+        return (None if version == known_version else self.store.rows()), version
@@ -0,0 +1,132 @@
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+# O Notion aceita em média ~3 requisições/s por integração
+RATE_LIMIT = 3.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class NotionError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class TokenBucket:
+    """Limitador client-side: `rate` fichas por segundo, rajadas de até `capacity`."""
+
+    def __init__(self, rate=RATE_LIMIT, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                agora = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (agora - self.updated) * self.rate)
+                self.updated = agora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.rate
+            time.sleep(espera)
+
+
+class RequestStats:
+    """Contadores por requisição; `snapshot()` devolve um resumo para inspeção."""
+
+    def __init__(self, window=1000):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.throttled = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def record(self, latency, status, sent=0, received=0):
+        with self.lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            self.bytes_sent += sent
+            self.bytes_received += received
+            if status == 429: self.throttled += 1
+
+    def bump(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self):
+        with self.lock:
+            lat = sorted(self.latencies)
+            pct = lambda q: lat[min(int(q * len(lat)), len(lat) - 1)] if lat else 0.0
+            return {
+                "requests": self.requests, "retries": self.retries, "errors": self.errors, "throttled": self.throttled,
+                "bytes_sent": self.bytes_sent, "bytes_received": self.bytes_received,
+                "latency_avg": sum(lat) / len(lat) if lat else 0.0,
+                "latency_p50": pct(0.50), "latency_p95": pct(0.95), "latency_max": lat[-1] if lat else 0.0,
+            }
+
+
+class NotionTransport:
+    """Camada HTTP do NotionClient: Session com pool, timeouts, retry com backoff e rate limit."""
+
+    def __init__(self, headers, timeout=(5, 30), max_retries=5, backoff=0.5, max_backoff=30.0, rate=RATE_LIMIT, pool_size=10):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.bucket = TokenBucket(rate) if rate else None
+        self.stats = RequestStats()
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _delay(self, attempt, response=None):
+        # Retry-After (em segundos) tem prioridade sobre o backoff exponencial
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try: return min(float(retry_after), self.max_backoff)
+            except ValueError: pass
+        return min(self.backoff * 2 ** attempt, self.max_backoff) * random.uniform(0.5, 1.0)
+
+    def get(self, url, params=None):
+        return self.request("GET", url, params=params)
+
+    def post(self, url, json=None, params=None):
+        return self.request("POST", url, json=json, params=params)
+
+    def request(self, method, url, json=None, params=None):
+        for attempt in range(self.max_retries + 1):
+            if self.bucket: self.bucket.acquire()
+            inicio = time.perf_counter()
+            try:
+                response = self.session.request(method, url, json=json, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                self.stats.record(time.perf_counter() - inicio, None)
+                if attempt == self.max_retries:
+                    self.stats.bump("errors")
+                    raise NotionError(f"Erro Notion: {exc}") from exc
+                response = None
+            else:
+                self.stats.record(time.perf_counter() - inicio, response.status_code,
+                                  sent=len(response.request.body or b""), received=len(response.content))
+                if response.status_code == 200:
+                    return response.json()
+                if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                    self.stats.bump("errors")
+                    raise NotionError(f"Erro Notion: {response.text}", status=response.status_code)
+            self.stats.bump("retries")
+            time.sleep(self._delay(attempt, response))
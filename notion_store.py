@@ -0,0 +1,115 @@
+import hashlib
+import json
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+
+# Versão do formato das linhas gravadas; arquivos de outra versão são recriados
+SCHEMA_VERSION = "2"
+
+
+def content_version(pages):
+    """Digest de pares (id, linha em JSON), na ordem dada; 'total:hash'."""
+    digest, total = hashlib.blake2b(digest_size=8), 0
+    for page_id, row in pages:
+        digest.update(f"{page_id}\x00{row}\x00".encode())
+        total += 1
+    return f"{total}:{digest.hexdigest()}"
+
+
+class NotionStore:
+    """Cópia local (SQLite) das páginas já baixadas do Notion, já projetadas em tuplas."""
+
+    def __init__(self, path, db_id):
+        self.path = Path(path)
+        self.db_id = db_id
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        if self._get_meta("schema_version") != SCHEMA_VERSION:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("DROP TABLE IF EXISTS pages")
+                conn.execute("DELETE FROM meta")
+        with closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS pages (id TEXT PRIMARY KEY, last_edited_time TEXT NOT NULL, row TEXT NOT NULL)")
+        self._set_meta("schema_version", SCHEMA_VERSION)
+        # Se o arquivo pertence a outro database, começa do zero
+        if self._get_meta("db_id") not in (None, db_id):
+            self.clear()
+        self._set_meta("db_id", db_id)
+
+    def _connect(self):
+        # Uma conexão por operação: o Streamlit chama a partir de threads diferentes
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _get_meta(self, key):
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    @property
+    def high_water_mark(self):
+        """Maior `last_edited_time` já armazenado (None se o store está vazio)."""
+        return self._get_meta("high_water_mark")
+
+    @property
+    def last_reconcile(self):
+        value = self._get_meta("last_reconcile")
+        return float(value) if value else 0.0
+
+    def count(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def is_empty(self):
+        return self.count() == 0
+
+    def clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM pages")
+            conn.execute("DELETE FROM meta WHERE key NOT IN ('db_id', 'schema_version')")
+
+    def upsert(self, records):
+        """Grava registros (id, last_edited_time, arquivada, linha) e remove os arquivados.
+
+        Retorna (gravadas, removidas).
+        """
+        vivas = [(page_id, editado, json.dumps(row, ensure_ascii=False)) for page_id, editado, arquivada, row in records if not arquivada]
+        mortas = [(page_id,) for page_id, _, arquivada, _ in records if arquivada]
+        with closing(self._connect()) as conn, conn:
+            conn.executemany("INSERT OR REPLACE INTO pages (id, last_edited_time, row) VALUES (?, ?, ?)", vivas)
+            conn.executemany("DELETE FROM pages WHERE id = ?", mortas)
+        if records:
+            # Timestamps ISO-8601 em UTC ordenam corretamente como texto
+            hwm = max(editado for _, editado, _, _ in records)
+            if self.high_water_mark is None or hwm > self.high_water_mark:
+                self._set_meta("high_water_mark", hwm)
+        return len(vivas), len(mortas)
+
+    def retain(self, page_ids):
+        """Remove do store as páginas que não existem mais no Notion. Retorna quantas saíram."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TEMP TABLE vivos (id TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO vivos (id) VALUES (?)", [(i,) for i in page_ids])
+            removidas = conn.execute("DELETE FROM pages WHERE id NOT IN (SELECT id FROM vivos)").rowcount
+        self.mark_reconciled()
+        return removidas
+
+    def mark_reconciled(self):
+        self._set_meta("last_reconcile", time.time())
+
+    @property
+    def version(self):
+        """Versão do conteúdo: muda só quando alguma página entra, sai ou tem a linha alterada."""
+        with closing(self._connect()) as conn:
+            return content_version(conn.execute("SELECT id, row FROM pages ORDER BY id"))
+
+    def rows(self):
+        with closing(self._connect()) as conn:
+            return [tuple(json.loads(row)) for (row,) in conn.execute("SELECT row FROM pages ORDER BY last_edited_time DESC")]
@@ -0,0 +1,123 @@
+import contextvars
+import csv
+import functools
+import io
+import json
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+
+
+class Profiler:
+    """Instrumentação opt-in: spans de tempo por etapa e contadores nomeados.
+
+    Fica ligada só dentro de `recording()`, no contexto de quem ligou (a execução do
+    script de uma sessão), ou para o processo todo com `enabled=True` (scripts e
+    benchmarks). Desligada, cada span custa só um teste de flag. Guarda os últimos
+    `window` spans para exportação e agrega por nome em `summary()`.
+    """
+
+    def __init__(self, enabled=False, window=5000):
+        self.enabled = enabled
+        self.spans = deque(maxlen=window)
+        self.counters = Counter()
+        self.lock = threading.Lock()
+        self._recording = contextvars.ContextVar("profiler_recording", default=False)
+
+    @property
+    def active(self):
+        return self.enabled or self._recording.get()
+
+    @contextmanager
+    def recording(self, on=True):
+        """Liga (ou não, com `on=False`) a instrumentação só no contexto atual, sem afetar outras sessões.
+
+        Threads novas não herdam o contexto (rode-as com contextvars.copy_context().run), nem a
+        reexecução isolada de um fragmento (que abre o seu próprio recording, ver app.fragment).
+        """
+        token = self._recording.set(on)
+        try:
+            yield
+        finally:
+            self._recording.reset(token)
+
+    @contextmanager
+    def span(self, name):
+        if not self.active:
+            yield
+            return
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            with self.lock:
+                self.spans.append({"name": name, "start": time.time() - duracao, "seconds": duracao,
+                                   "thread": threading.current_thread().name})
+
+    def timed(self, name=None):
+        """Decorador: um span por chamada, com o nome da função por padrão."""
+        def decorator(fn):
+            rotulo = name or fn.__name__
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(rotulo):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, n=1):
+        if self.active:
+            with self.lock:
+                self.counters[name] += n
+
+    def reset(self):
+        with self.lock:
+            self.spans.clear()
+            self.counters.clear()
+
+    def summary(self):
+        """Uma linha por nome de span: chamadas, total, média e máximo (s), do maior total ao menor."""
+        with self.lock:
+            spans = list(self.spans)
+        grupos = {}
+        for s in spans:
+            grupos.setdefault(s["name"], []).append(s["seconds"])
+        linhas = [{"name": nome, "calls": len(t), "total": sum(t), "mean": sum(t) / len(t), "max": max(t)} for nome, t in grupos.items()]
+        return sorted(linhas, key=lambda l: l["total"], reverse=True)
+
+    def to_json(self, **extra):
+        """Spans, agregados e contadores (mais o que vier em `extra`) como JSON."""
+        with self.lock:
+            dados = {"spans": list(self.spans), "counters": dict(self.counters)}
+        return json.dumps({"summary": self.summary(), **dados, **extra}, ensure_ascii=False, indent=2, default=str)
+
+    def to_csv(self):
+        """Spans crus, um por linha."""
+        with self.lock:
+            spans = list(self.spans)
+        saida = io.StringIO()
+        writer = csv.DictWriter(saida, fieldnames=["name", "start", "seconds", "thread"])
+        writer.writeheader()
+        writer.writerows(spans)
+        return saida.getvalue()
+
+
+class Instrumented:
+    """Proxy de um módulo em que cada função chamada vira um span `prefixo.nome` (ex.: px.sunburst)."""
+
+    def __init__(self, module, prefix, profiler):
+        self._module = module
+        self._prefix = prefix
+        self._profiler = profiler
+
+    def __getattr__(self, attr):
+        valor = getattr(self._module, attr)
+        if not callable(valor):
+            return valor
+        return self._profiler.timed(f"{self._prefix}.{attr}")(valor)
+
+
+# Instância do processo: cada execução do app liga a sua gravação pelo painel de debug
+PROFILER = Profiler()
@@ -0,0 +1,131 @@
+"""Relatório mensal em batch (sem Streamlit), para rodar via cron.
+
+Lê as transações do snapshot do app (ver snapshot.py) ou, com --online, sincroniza
+direto com o Notion, e calcula os mesmos indicadores das abas com o módulo analytics.
+
+Uso: python report.py [--mes Setembro] [--ano 2026] [--online] [--format json|text] [-o arquivo]
+"""
+import argparse
+import datetime
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+from analytics import (MONTH_INDEX, PayeeIndex, budget, build_cube, cash_flow, expenses_by_bank, investment_goal,
+                       project_installments)
+from formatting import formata_br
+from ingest import MONTHS_ORDER, PeriodIndex, process_rows
+from ledger import Ledger
+from settings import Settings, read_secrets
+
+
+def monthly_report(df, mes, ano, settings, horizon=12):
+    """Todos os indicadores de `mes`/`ano` como dicts e DataFrames."""
+    df_mes = PeriodIndex(df).month(df, mes, ano)
+    cube_mes = build_cube(df_mes)
+    gastos = df_mes[df_mes['is_real_expense']]
+    periodo = ano * 12 + MONTH_INDEX[mes]
+
+    parcelas = project_installments(df, start=periodo + 1, horizon=horizon)
+    return {
+        "mes": mes,
+        "ano": ano,
+        "transacoes": len(df_mes),
+        "fluxo_de_caixa": cash_flow(df_mes),
+        "meta_investimentos": investment_goal(cube_mes, settings.meta_investimentos),
+        "orcamento": budget(cube_mes, settings.metas_custos),
+        "gastos_por_banco": expenses_by_bank(gastos),
+        "favorecidos": PayeeIndex(df, [settings.meu_nome], settings.aliases_favorecidos).top(ano, mes),
+        "parcelas_futuras": parcelas.groupby(['Periodo', 'Mes'])['Valor'].sum().reset_index(),
+        # Posição no fim do mês do relatório: saldos de janeiro do ano + o que foi pago até o mês
+        "patrimonio": Ledger().sync(df).position(ano, settings.opening_balances(), until=periodo),
+    }
+
+
+def load_transactions(secrets, online=False):
+    """DataFrame processado: o snapshot do app ou, com `online` (ou sem snapshot), o Notion."""
+    from snapshot import load_snapshot
+
+    db_id = secrets.get("DATABASE_ID", "")
+    snapshot_path = secrets.get("SNAPSHOT_PATH", ".cache/snapshot.arrow")
+    if not online and snapshot_path:
+        snapshot = load_snapshot(snapshot_path, db_id)
+        if snapshot is not None:
+            return snapshot.df
+    if "NOTION_TOKEN" not in secrets:
+        raise SystemExit(f"Sem snapshot em {snapshot_path!r} e sem NOTION_TOKEN para buscar no Notion.")
+
+    from notion_api import NotionClient
+    from notion_store import NotionStore
+
+    store_path = secrets.get("NOTION_STORE_PATH", ".cache/notion.sqlite3")
+    store = NotionStore(store_path, db_id) if store_path else None
+    rows, _ = NotionClient(secrets["NOTION_TOKEN"], db_id, store=store).sync()
+    return process_rows(rows)
+
+
+def _json_default(obj):
+    if isinstance(obj, pd.DataFrame):
+        return obj.to_dict(orient="records")
+    if isinstance(obj, (np.generic, pd.Timestamp)):
+        return obj.isoformat() if isinstance(obj, pd.Timestamp) else obj.item()
+    raise TypeError(f"{type(obj).__name__} não é serializável")
+
+
+def as_text(report):
+    fluxo, meta, pat = report["fluxo_de_caixa"], report["meta_investimentos"], report["patrimonio"]
+    # Números no formato pt-BR, como no app
+    brl = lambda valor, largura=0: f"R$ {formata_br(float(valor)):>{largura}}"
+    pct = lambda valor: f"{valor:,.1f}%".replace(",", "X").replace(".", ",").replace("X", ".")
+    linhas = [
+        f"Relatório de {report['mes']}/{report['ano']} ({report['transacoes']} transações)",
+        f"  Entradas:            {brl(fluxo['entradas'], 14)}",
+        f"  Custos:              {brl(fluxo['custos'], 14)}",
+        f"  Investido:           {brl(fluxo['investido'], 14)}  (meta {brl(meta['meta'])}, {pct(meta['atingimento'])})",
+        f"  Sobra livre:         {brl(fluxo['sobra_livre'], 14)}",
+        f"  Taxa de poupança:    {pct(fluxo['taxa_poupanca'])}",
+        "Orçamento:",
+        *(f"  {r.Categoria:24s} {brl(r.Gasto, 12)} / {formata_br(float(r.Meta)):>12}" + (f"  estouro {brl(r.Estouro)}" if r.Estouro > 0 else "")
+          for r in report["orcamento"].itertuples()),
+        "Maiores favorecidos:",
+        *(f"  {r.Favorecido:24s} {brl(r.Valor_Abs, 12)}" for r in report["favorecidos"].itertuples()),
+        "Parcelas futuras:",
+        *(f"  {r.Mes:24s} {brl(r.Valor, 12)}" for r in report["parcelas_futuras"].itertuples()),
+        f"Patrimônio líquido:    {brl(pat['patrimonio_liquido'], 14)}",
+    ]
+    return "\n".join(linhas) + "\n"
+
+
+def main(argv=None):
+    hoje = datetime.date.today()
+    # Padrão: o último mês fechado
+    anterior = hoje.replace(day=1) - datetime.timedelta(days=1)
+    parser = argparse.ArgumentParser(description="Relatório mensal do controle financeiro")
+    parser.add_argument("--mes", default=MONTHS_ORDER[anterior.month - 1], help="nome (Setembro) ou número (9) do mês de pagamento")
+    parser.add_argument("--ano", type=int, default=anterior.year)
+    parser.add_argument("--online", action="store_true", help="sincroniza com o Notion em vez de ler o snapshot")
+    parser.add_argument("--secrets", default=None, help="secrets.toml (padrão: .streamlit/secrets.toml)")
+    parser.add_argument("--format", choices=["json", "text"], default="json")
+    parser.add_argument("-o", "--output", default=None, help="arquivo de saída (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    mes = args.mes.capitalize()
+    if args.mes.isdigit() and 1 <= int(args.mes) <= 12:
+        mes = MONTHS_ORDER[int(args.mes) - 1]
+    if mes not in MONTHS_ORDER:
+        parser.error(f"mês inválido: {args.mes}")
+
+    secrets = read_secrets(args.secrets) if args.secrets else read_secrets()
+    report = monthly_report(load_transactions(secrets, args.online), mes, args.ano, Settings.from_secrets(secrets))
+    saida = as_text(report) if args.format == "text" else json.dumps(report, default=_json_default, ensure_ascii=False, indent=2) + "\n"
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(saida)
+    else:
+        sys.stdout.write(saida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+SECRETS_PATH = Path(".streamlit") / "secrets.toml"
+# Valores aceitos como "ligado" em secrets booleanos (o toml dá bool; variável de ambiente dá texto)
+TRUE_VALUES = {"1", "true", "sim", "yes"}
+# Os secrets de saldo sem ANO_SALDOS foram informados como saldos de janeiro/2026 (o rótulo antigo do app)
+ANO_SALDOS_PADRAO = 2026
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Saldos, dívidas e metas lidos dos secrets; compartilhado pelo app e pelo relatório em batch.
+
+    Saldo da renda fixa e dívidas valem para janeiro de `ano_saldos`; os outros anos são
+    rolados a partir deles pelo livro-razão (ver ledger.Ledger).
+    """
+    saldo_inicial_renda_fixa: float = 0.0
+    divida_casa: float = 0.0
+    divida_terreno: float = 0.0
+    metas_custos: dict = field(default_factory=dict)
+    meta_investimentos: float = 0.0
+    meu_nome: str = "Usuario"
+    ano_saldos: int = ANO_SALDOS_PADRAO
+    # {nome exibido: [outras grafias]} do mesmo favorecido (ver analytics.PayeeIndex)
+    aliases_favorecidos: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_secrets(cls, secrets):
+        """`secrets` é qualquer mapeamento com .get (st.secrets ou o dict de read_secrets)."""
+        valor = lambda chave: float(secrets.get(chave, 0.00))
+        return cls(
+            saldo_inicial_renda_fixa=valor("SALDO_INICIAL_RENDA_FIXA"),
+            divida_casa=valor("DIVIDA_ATUAL_CASA"),
+            divida_terreno=valor("DIVIDA_ATUAL_TERRENO"),
+            metas_custos={
+                "Despesas essenciais": valor("META_ESSENCIAIS"),
+                "Gastos não essenciais": valor("META_NAO_ESSENCIAIS"),
+                "Impostos e taxas": valor("META_IMPOSTOS"),
+            },
+            meta_investimentos=valor("META_INVESTIMENTOS"),
+            meu_nome=secrets.get("MEU_NOME", "Usuario"),
+            ano_saldos=int(secrets.get("ANO_SALDOS", ANO_SALDOS_PADRAO)),
+            aliases_favorecidos={nome: list(grafias) for nome, grafias in secrets.get("ALIASES_FAVORECIDOS", {}).items()},
+        )
+
+    def opening_balances(self):
+        """Saldos de abertura das contas do livro-razão: {conta: (periodo, saldo)}."""
+        periodo = self.ano_saldos * 12
+        return {
+            "Renda fixa": (periodo, self.saldo_inicial_renda_fixa),
+            "Moradia": (periodo, self.divida_casa),
+            "Imóveis": (periodo, self.divida_terreno),
+        }
+
+
+def flag(valor):
+    """Secret booleano: "false", "0" ou vazio desligam (bool("false") seria True)."""
+    return str(valor).strip().lower() in TRUE_VALUES
+
+
+def read_secrets(path=SECRETS_PATH):
+    """Secrets fora do Streamlit: o mesmo secrets.toml do app, com variáveis de ambiente por cima."""
+    import tomllib  # só o relatório em batch lê o toml diretamente
+    path = Path(path)
+    secrets = tomllib.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+    chaves = set(secrets) | {"NOTION_TOKEN", "DATABASE_ID", "NOTION_STORE_PATH", "SNAPSHOT_PATH", "MEU_NOME",
+                             "SALDO_INICIAL_RENDA_FIXA", "DIVIDA_ATUAL_CASA", "DIVIDA_ATUAL_TERRENO",
+                             "META_ESSENCIAIS", "META_NAO_ESSENCIAIS", "META_IMPOSTOS", "META_INVESTIMENTOS", "ANO_SALDOS"}
+    return {**secrets, **{k: os.environ[k] for k in chaves if k in os.environ}}
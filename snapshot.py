@@ -0,0 +1,52 @@
+import datetime
+import os
+from pathlib import Path
+
+import pyarrow as pa
+
+from dataset import Snapshot
+
+
+# Versão do formato do arquivo; arquivos de outra versão são ignorados
+# (2: colunas categóricas e nulos reais no lugar de "N/A"; 3: Periodo/Ano, ordenado por Ano;
+#  4: Favorecido_Chave)
+SNAPSHOT_FORMAT = "4"
+
+
+def save_snapshot(path, snapshot, db_id):
+    """Grava o DataFrame processado + metadados da sincronização em um arquivo Arrow IPC.
+
+    O arquivo é escrito sem compressão para poder ser lido via memory-map, e a troca é
+    atômica (arquivo temporário + rename): um leitor nunca vê um snapshot pela metade.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(snapshot.df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"snapshot_format": SNAPSHOT_FORMAT.encode(),
+        b"db_id": db_id.encode(),
+        b"version": snapshot.version.encode(),
+        b"loaded_at": snapshot.loaded_at.isoformat().encode(),
+    })
+    tmp = path.with_name(path.name + ".tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+
+
+def load_snapshot(path, db_id):
+    """Snapshot gravado por save_snapshot, ou None se não existe, é de outro database ou de outro formato."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    try:
+        with pa.memory_map(str(path), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+    except (pa.ArrowInvalid, OSError):
+        return None
+    meta = table.schema.metadata or {}
+    if meta.get(b"snapshot_format") != SNAPSHOT_FORMAT.encode() or meta.get(b"db_id") != db_id.encode():
+        return None
+    loaded_at = datetime.datetime.fromisoformat(meta[b"loaded_at"].decode())
+    return Snapshot(table.to_pandas(), meta[b"version"].decode(), loaded_at)
@@ -0,0 +1,24 @@
+import math
+
+import numpy as np
+
+
+def paginate(df, page=1, page_size=50, sort_by=None, ascending=True, search=None, search_columns=()):
+    """Busca, ordena e fatia `df` no servidor, sobre as colunas tipadas.
+
+    `search` é um texto procurado (sem diferenciar maiúsculas) em `search_columns`.
+    Retorna (linhas da página, total de linhas após a busca, total de páginas); `page`
+    fora do intervalo é ajustada para a primeira/última página.
+    """
+    if search:
+        filtro = np.zeros(len(df), dtype=bool)
+        for coluna in search_columns:
+            filtro |= df[coluna].astype(str).str.contains(search, case=False, regex=False, na=False).to_numpy()
+        df = df[filtro]
+    if sort_by is not None:
+        df = df.sort_values(sort_by, ascending=ascending, kind='stable', na_position='last')
+    total = len(df)
+    paginas = max(math.ceil(total / page_size), 1)
+    page = min(max(page, 1), paginas)
+    inicio = (page - 1) * page_size
+    return df.iloc[inicio:inicio + page_size], total, paginas
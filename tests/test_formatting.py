@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from formatting import formata_br, formata_br_array
+
+
+CASOS = [0.0, -0.0, 0.001, -0.001, 0.005, -0.005, 0.015, 0.125, 1.005, 2.675, -2.675, 999.995, 1234.5, -1234.5,
+         999_999.99, 1_000_000.0, -12_345_678.9, 1e12 + 0.01, 9.99e12, 1e13, -1e15, 1e20, float("inf"), float("-inf")]
+
+
+def test_escalar():
+    assert formata_br(1234.5) == "1.234,50"
+    assert formata_br(-1234567.891) == "-1.234.567,89"
+    assert formata_br(0) == "0,00"
+
+
+@pytest.mark.parametrize("primeiro", [0.0, -0.0])
+def test_zero_negativo_nao_contamina_o_cache(primeiro):
+    formata_br(primeiro)
+    assert formata_br(0.0) == formata_br(-0.0) == "0,00"
+    assert formata_br_array(np.array([primeiro, -0.0, 0.0])).tolist() == ["0,00"] * 3
+
+
+def test_vetor_igual_ao_escalar():
+    valores = np.array(CASOS)
+    assert formata_br_array(valores).tolist() == [formata_br(v) for v in CASOS]
+
+
+def test_vetor_aleatorio():
+    rng = np.random.default_rng(0)
+    valores = np.concatenate([np.round(rng.normal(0, 5000, 20_000), 2), rng.uniform(-1e12, 1e12, 2_000),
+                              rng.integers(-10**6, 10**6, 2_000) / 1000 + 0.0005])
+    assert formata_br_array(valores).tolist() == [formata_br(float(v)) for v in valores]
+
+
+def test_series_e_nan():
+    serie = pd.Series([1.5, np.nan, -0.0, 1.5], index=[10, 11, 12, 13], name="Valor")
+    texto = formata_br_array(serie)
+    assert texto.index.tolist() == [10, 11, 12, 13] and texto.name == "Valor"
+    assert texto.tolist() == ["1,50", formata_br(float("nan")), "0,00", "1,50"]
+    assert formata_br_array(np.array([])).tolist() == []
@@ -0,0 +1,61 @@
+import pytest
+
+from analytics import project_installments
+from ingest import EXTRACTORS, MISSING, SCHEMA, process_data, process_rows, project_pages
+
+
+def pagina(**props):
+    return {"id": "p", "properties": props}
+
+
+MALFORMADAS = [
+    pagina(),
+    pagina(**{"Banco": None, "Transação": {"title": []}, "Valor": {"number": None}, "Parcela": {"rich_text": None}}),
+    pagina(**{"Banco": {"select": {}}, "Data": {"formula": None}, "Favorecido": {"rich_text": [{}]}}),
+    pagina(**{"Banco": {"select": {"name": "Nubank"}}, "Valor": "12", "Tipo de despesa": {"select": None},
+              "Data": {"formula": {"string": "01/03/2026"}}, "Descrição": {"rich_text": [{"plain_text": "ok"}]}}),
+]
+
+
+def linha(tipo=None, parcela=None, mes="Março"):
+    # Mesma ordem do SCHEMA: Data, Banco, Transação, Valor, Tipo, Mês, Favorecido, Descrição, Parcela
+    return ("01/03/2026", "Nubank", "Compra", 10.0, tipo, mes, None, None, parcela)
+
+
+@pytest.mark.parametrize("linhas", [[], [linha()], [linha(), linha()]], ids=["vazio", "um_nulo", "todos_nulos"])
+def test_tipo_e_parcela_sem_valores(linhas):
+    df = process_rows(linhas)
+    assert len(df) == len(linhas)
+    assert not df['is_card_payment'].any()
+    assert df['Macro_Grupo'].tolist() == ['Outros'] * len(linhas)
+    assert project_installments(df, start=2026 * 12).empty
+
+
+def test_pagamento_de_cartao():
+    df = process_rows([linha("Pagamento de cartão"), linha("Supermercado")])
+    assert df['is_card_payment'].tolist() == [True, False]
+    assert df['is_real_expense'].tolist() == [False, True]
+
+
+def test_parcelas_com_nulos():
+    df = process_rows([linha(parcela="2/3"), linha()])
+    proj = project_installments(df, start=2026 * 12 + 2)
+    assert proj['Parcela'].tolist() == ["2/3", "3/3"]
+    assert proj['Mes'].tolist() == ["Março/2026", "Abril/2026"]
+
+
+def test_parcelas_futuras_ja_lancadas_contam_uma_vez():
+    # Parcelas 1/3 e 2/3 já lançadas: a projeção parte da 1ª, sem repetir nem perder parcelas
+    df = process_rows([linha(parcela="1/3"), linha(parcela="2/3", mes="Abril")])
+    proj = project_installments(df, start=2026 * 12 + 2)
+    assert proj['Parcela'].tolist() == ["1/3", "2/3", "3/3"]
+    assert proj['Mes'].tolist() == ["Março/2026", "Abril/2026", "Maio/2026"]
+    assert project_installments(df, start=2026 * 12 + 5).empty
+
+
+def test_projecao_igual_aos_extratores_tolerantes():
+    tolerantes = [EXTRACTORS[p_type](prop, MISSING.get(p_type)) for prop, p_type, _ in SCHEMA]
+    esperado = [tuple(extract(p["properties"]) for extract in tolerantes) for p in MALFORMADAS]
+    assert project_pages(MALFORMADAS) == esperado
+    assert esperado[3][:4] == ("01/03/2026", "Nubank", "Sem Título", 0.0)
+    assert len(process_data(MALFORMADAS)) == len(MALFORMADAS)
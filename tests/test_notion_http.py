@@ -0,0 +1,97 @@
+"""NotionTransport contra um servidor HTTP falso local (retry, Retry-After e rate limit)."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from notion_http import NotionError, NotionTransport
+
+
+class FakeNotion(ThreadingHTTPServer):
+    """Responde cada requisição com a próxima resposta de `script` (a última se repete)."""
+
+    def __init__(self, script):
+        super().__init__(("127.0.0.1", 0), FakeHandler)
+        self.script = list(script)
+        self.hits = []
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/databases/db/query"
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        server = self.server
+        server.hits.append(time.monotonic())
+        status, headers = server.script.pop(0) if len(server.script) > 1 else server.script[0]
+        body = json.dumps({"results": [], "has_more": False} if status == 200 else {"message": "erro"}).encode()
+        self.send_response(status)
+        for chave, valor in {**headers, "Content-Type": "application/json", "Content-Length": str(len(body))}.items():
+            self.send_header(chave, valor)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_notion():
+    servidores = []
+
+    def start(*script):
+        server = FakeNotion(script)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servidores.append(server)
+        return server
+
+    yield start
+    for server in servidores:
+        server.shutdown()
+        server.server_close()
+
+
+def transport(**kwargs):
+    return NotionTransport({"Authorization": "Bearer teste"}, **{"rate": None, "backoff": 0.01, **kwargs})
+
+
+def test_429_respeita_retry_after(fake_notion):
+    server = fake_notion((429, {"Retry-After": "0.3"}), (200, {}))
+    t = transport()
+    assert t.post(server.url, json={}) == {"results": [], "has_more": False}
+    assert len(server.hits) == 2
+    assert server.hits[1] - server.hits[0] >= 0.3
+    stats = t.stats.snapshot()
+    assert (stats["requests"], stats["retries"], stats["throttled"], stats["errors"]) == (2, 1, 1, 0)
+
+
+def test_desiste_apos_max_retries(fake_notion):
+    server = fake_notion((503, {}))
+    t = transport(max_retries=2)
+    with pytest.raises(NotionError) as erro:
+        t.post(server.url, json={})
+    assert erro.value.status == 503
+    assert len(server.hits) == 3
+    assert t.stats.snapshot()["errors"] == 1
+
+
+def test_erro_do_cliente_nao_repete(fake_notion):
+    server = fake_notion((400, {}))
+    with pytest.raises(NotionError) as erro:
+        transport().post(server.url, json={})
+    assert erro.value.status == 400
+    assert len(server.hits) == 1
+
+
+def test_ritmo_de_3_requisicoes_por_segundo(fake_notion):
+    server = fake_notion((200, {}))
+    t = transport(rate=3.0)
+    for _ in range(7):
+        t.post(server.url, json={})
+    # Rajada inicial de 3 fichas; as seguintes saem a 3/s
+    for i, hit in enumerate(server.hits[3:], start=1):
+        assert hit - server.hits[0] >= i / 3 - 0.05
@@ -0,0 +1,13 @@
+import pytest
+
+from settings import flag
+
+
+@pytest.mark.parametrize("valor", [True, 1, "1", "true", "True", " SIM ", "yes"])
+def test_flag_ligado(valor):
+    assert flag(valor)
+
+
+@pytest.mark.parametrize("valor", [False, 0, None, "", "0", "false", "False", "não", "no"])
+def test_flag_desligado(valor):
+    assert not flag(valor)